@@ -0,0 +1,341 @@
+"""This module contains a columnar container for parsed audit trail logs"""
+from datetime import datetime
+
+from dhpythonirodsutils import parsers
+from dhpythonirodsutils.enums import AuditTailTopics
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# Code used when a value is missing, e.g. in user_id_codes for the audit logs without user id
+MISSING_CODE = -1
+
+
+class AuditTrailBatch:
+    """
+    Columnar batch of parsed audit trail logs, backed by NumPy arrays.
+
+    Attributes:
+        time_stamps -- datetime64[s] array of the (naive, local) time stamps
+        topic_codes -- int16 array of indexes into topics, which starts with the AuditTailTopics values
+        topics -- list of the topic names
+        user_id_codes -- int32 array of indexes into user_ids, MISSING_CODE if missing
+        user_ids -- list of the user identifier numbers, as logged (strings)
+        user_name_codes -- int32 array of indexes into user_names, MISSING_CODE if missing
+        user_names -- list of the user names
+        event_buffer -- bytes, all the UTF-8 encoded events concatenated
+        event_offsets -- int64 array of len(batch) + 1 offsets into event_buffer
+    """
+
+    def __init__(
+        self,
+        time_stamps,
+        topic_codes,
+        topics,
+        user_id_codes,
+        user_ids,
+        user_name_codes,
+        user_names,
+        event_buffer,
+        event_offsets,
+    ):
+        if np is None:
+            raise ImportError("numpy is required to use AuditTrailBatch")
+        self.time_stamps = time_stamps
+        self.topic_codes = topic_codes
+        self.topics = topics
+        self.user_id_codes = user_id_codes
+        self.user_ids = user_ids
+        self.user_name_codes = user_name_codes
+        self.user_names = user_names
+        self.event_buffer = event_buffer
+        self.event_offsets = event_offsets
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build a batch from parsed audit logs.
+
+        Parameters
+        ----------
+        records: iterable
+            Parsed audit logs (dict or AuditRecord), see parsers.parse_audit_trail_message.
+            time_stamp can either be a string, a datetime object or a number of seconds since the epoch (converted to
+            the local time, like the time stamps of the logs).
+
+        Returns
+        -------
+        AuditTrailBatch
+            The columnar batch
+        """
+        if np is None:
+            raise ImportError("numpy is required to use AuditTrailBatch")
+        topics = [topic.value for topic in AuditTailTopics]
+        topic_index = {topic: code for code, topic in enumerate(topics)}
+        user_ids = []
+        user_id_index = {}
+        user_names = []
+        user_name_index = {}
+
+        time_stamps = []
+        topic_codes = []
+        user_id_codes = []
+        user_name_codes = []
+        events = []
+        for record in records:
+            time_stamp = record["time_stamp"]
+            if isinstance(time_stamp, (int, float)):
+                # datetime64 would read the epoch as UTC
+                time_stamp = datetime.fromtimestamp(time_stamp)
+            time_stamps.append(time_stamp)
+
+            topic = record["topic"]
+            topic_code = topic_index.get(topic)
+            if topic_code is None:
+                topic_code = topic_index[topic] = len(topics)
+                topics.append(topic)
+            topic_codes.append(topic_code)
+
+            irods_user_id = record["irods_user_id"]
+            if not irods_user_id:
+                user_id_codes.append(MISSING_CODE)
+            else:
+                # Kept as logged: leading zeros and non-ASCII digits wouldn't survive a conversion to int
+                user_id_code = user_id_index.get(irods_user_id)
+                if user_id_code is None:
+                    user_id_code = user_id_index[irods_user_id] = len(user_ids)
+                    user_ids.append(irods_user_id)
+                user_id_codes.append(user_id_code)
+
+            irods_user_name = record["irods_user_name"]
+            if irods_user_name is None:
+                user_name_codes.append(MISSING_CODE)
+            else:
+                user_name_code = user_name_index.get(irods_user_name)
+                if user_name_code is None:
+                    user_name_code = user_name_index[irods_user_name] = len(user_names)
+                    user_names.append(irods_user_name)
+                user_name_codes.append(user_name_code)
+
+            events.append(record["event"].encode("utf-8"))
+
+        event_offsets = np.zeros(len(events) + 1, dtype=np.int64)
+        np.cumsum([len(event) for event in events], out=event_offsets[1:])
+        return cls(
+            np.array(time_stamps, dtype="datetime64[s]"),
+            np.array(topic_codes, dtype=np.int16),
+            topics,
+            np.array(user_id_codes, dtype=np.int32),
+            user_ids,
+            np.array(user_name_codes, dtype=np.int32),
+            user_names,
+            b"".join(events),
+            event_offsets,
+        )
+
+    @classmethod
+    def from_source(cls, source, chunk_size=parsers.READ_CHUNK_SIZE):
+        """
+        Build a batch from all the audit trail messages found in a log source.
+
+        Parameters
+        ----------
+        source: str|os.PathLike|file object|iterable
+            See parsers.iter_audit_trail_messages
+        chunk_size: int
+            The approximate number of bytes read at once from a file
+
+        Returns
+        -------
+        AuditTrailBatch
+            The columnar batch
+        """
+        return cls.from_records(parsers.iter_audit_trail_messages(source, chunk_size=chunk_size))
+
+    def __len__(self):
+        return len(self.time_stamps)
+
+    def event(self, index):
+        """
+        Decode a single event.
+
+        Parameters
+        ----------
+        index: int
+            The row index
+
+        Returns
+        -------
+        str
+            The logged event
+        """
+        return self.event_buffer[self.event_offsets[index] : self.event_offsets[index + 1]].decode("utf-8")
+
+    def row(self, index):
+        """
+        Get a single row, in the same format as parsers.parse_audit_trail_message.
+
+        Parameters
+        ----------
+        index: int
+            The row index
+
+        Returns
+        -------
+        dict
+            The parsed audit log, with the time_stamp as a string
+        """
+        user_name_code = self.user_name_codes[index]
+        if user_name_code != MISSING_CODE:
+            irods_user_id = None
+            irods_user_name = self.user_names[user_name_code]
+        else:
+            user_id_code = self.user_id_codes[index]
+            irods_user_id = "" if user_id_code == MISSING_CODE else self.user_ids[user_id_code]
+            irods_user_name = None
+        return {
+            "time_stamp": str(self.time_stamps[index]).replace("T", " "),
+            "irods_user_id": irods_user_id,
+            "irods_user_name": irods_user_name,
+            "topic": self.topics[self.topic_codes[index]],
+            "event": self.event(index),
+        }
+
+    def topic_code(self, topic):
+        """
+        Get the code of a topic in this batch.
+
+        Parameters
+        ----------
+        topic: AuditTailTopics|str
+            The topic
+
+        Returns
+        -------
+        int
+            The topic code, or MISSING_CODE if the topic is not present in this batch
+        """
+        if isinstance(topic, AuditTailTopics):
+            topic = topic.value
+        try:
+            return self.topics.index(topic)
+        except ValueError:
+            return MISSING_CODE
+
+    def topic_mask(self, topic):
+        """
+        Parameters
+        ----------
+        topic: AuditTailTopics|str
+            The topic to select
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean mask of the rows with this topic
+        """
+        return self.topic_codes == self.topic_code(topic)
+
+    def user_mask(self, user_id):
+        """
+        Parameters
+        ----------
+        user_id: int|str
+            The user identifier number to select, compared as logged (e.g: 10043 doesn't select 010043)
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean mask of the rows logged for this user id
+        """
+        try:
+            user_id_code = self.user_ids.index(str(user_id))
+        except ValueError:
+            return np.zeros(len(self), dtype=bool)
+        return self.user_id_codes == user_id_code
+
+    def time_mask(self, start=None, end=None):
+        """
+        Parameters
+        ----------
+        start: datetime|str
+            The start of the time range (inclusive), unbounded if None
+        end: datetime|str
+            The end of the time range (exclusive), unbounded if None
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean mask of the rows logged in the time range
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.time_stamps >= np.datetime64(_to_datetime(start), "s")
+        if end is not None:
+            mask &= self.time_stamps < np.datetime64(_to_datetime(end), "s")
+        return mask
+
+    def filter(self, mask):
+        """
+        Select a subset of the rows.
+
+        Parameters
+        ----------
+        mask: numpy.ndarray
+            Boolean mask (or integer indexes) of the rows to keep
+
+        Returns
+        -------
+        AuditTrailBatch
+            A new batch with the selected rows, sharing the topics, user_ids and user_names lists
+        """
+        indexes = np.arange(len(self))[mask]
+        starts = self.event_offsets[indexes]
+        ends = self.event_offsets[indexes + 1]
+        event_offsets = np.zeros(len(indexes) + 1, dtype=np.int64)
+        np.cumsum(ends - starts, out=event_offsets[1:])
+        return AuditTrailBatch(
+            self.time_stamps[indexes],
+            self.topic_codes[indexes],
+            self.topics,
+            self.user_id_codes[indexes],
+            self.user_ids,
+            self.user_name_codes[indexes],
+            self.user_names,
+            b"".join(self.event_buffer[start:end] for start, end in zip(starts.tolist(), ends.tolist())),
+            event_offsets,
+        )
+
+    def topic_histogram(self):
+        """
+        Returns
+        -------
+        dict
+            The number of rows per topic, for the topics present in the batch
+        """
+        counts = np.bincount(self.topic_codes, minlength=len(self.topics))
+        return {topic: int(count) for topic, count in zip(self.topics, counts) if count}
+
+    def time_histogram(self, unit="h"):
+        """
+        Count the rows per time bucket.
+
+        Parameters
+        ----------
+        unit: str
+            The NumPy datetime unit of the buckets, e.g: "m", "h", "D"
+
+        Returns
+        -------
+        tuple(numpy.ndarray, numpy.ndarray)
+            The sorted bucket start times and the number of rows in each bucket
+        """
+        return np.unique(self.time_stamps.astype("datetime64[{}]".format(unit)), return_counts=True)
+
+
+def _to_datetime(value):
+    if isinstance(value, str):
+        return parsers.decode_time_stamp(value)
+    return value
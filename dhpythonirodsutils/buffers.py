@@ -0,0 +1,211 @@
+"""This module contains an in-memory ring buffer of the recent audit trail events"""
+import threading
+import time
+from array import array
+from datetime import datetime
+
+from dhpythonirodsutils import loggers, parsers
+from dhpythonirodsutils.enums import AuditTailTopics
+
+RING_BUFFER_CAPACITY = 10000
+# User id stored for the audit logs without a numeric user id
+MISSING_USER_ID = -1
+
+
+class AuditTrailRingBuffer:
+    """
+    Fixed-capacity buffer of the most recent audit trail events, overwriting the oldest one when full.
+
+    The storage is preallocated: time stamps (epoch seconds), user ids and topic codes are kept in typed arrays, the
+    events in a plain list. Appending is O(1). While the buffered events are in time order, queries find the time
+    window with a binary search and only scan the events inside it. An event appended out of order (e.g. the clock
+    went back) is kept, and the queries scan the whole buffer until it's overwritten.
+    """
+
+    def __init__(self, capacity=RING_BUFFER_CAPACITY, now=time.time):
+        """
+        Parameters
+        ----------
+        capacity: int
+            The maximum number of events kept
+        now: callable
+            Return the current time, as seconds since the epoch. Used when no time stamp is given to append.
+        """
+        if capacity < 1:
+            raise ValueError("The ring buffer capacity must be at least 1")
+        self.capacity = capacity
+        self.now = now
+        self.time_stamps = array("q", bytes(8 * capacity))
+        self.user_ids = array("q", bytes(8 * capacity))
+        self.topic_codes = array("h", bytes(2 * capacity))
+        self.events = [None] * capacity
+        # Only set for the audit logs with a user name instead of a user id
+        self.user_names = [None] * capacity
+        self.topics = [topic.value for topic in AuditTailTopics]
+        self._topic_index = {topic: code for code, topic in enumerate(self.topics)}
+        self._next = 0
+        self._size = 0
+        # Number of events ever appended, and the number at the last out of order append
+        self._appended = 0
+        self._unordered_at = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def _topic_code(self, topic):
+        topic = loggers.format_topic(topic)
+        code = self._topic_index.get(topic)
+        if code is None:
+            code = self._topic_index[topic] = len(self.topics)
+            self.topics.append(topic)
+        return code
+
+    def append(self, user_id, topic, event, time_stamp=None, user_name=None):
+        """
+        Add an audit trail event, with the same arguments as loggers.format_audit_trail_message.
+
+        Parameters
+        ----------
+        user_id: int
+            The user identifier number.
+        topic: AuditTailTopics|str
+            The General topic for this log.
+        event: str
+            The event you want to be logged.
+        time_stamp: int|float|datetime
+            When the event happened, defaults to now
+        user_name: str
+            The user name, for the audit logs without user id
+        """
+        if time_stamp is None:
+            time_stamp = self.now()
+        elif isinstance(time_stamp, datetime):
+            time_stamp = time_stamp.timestamp()
+        if not isinstance(user_id, int):
+            user_id = MISSING_USER_ID
+        time_stamp = int(time_stamp)
+        with self._lock:
+            position = self._next
+            if self._size and time_stamp < self.time_stamps[position - 1]:
+                self._unordered_at = self._appended + 1
+            self.time_stamps[position] = time_stamp
+            self.user_ids[position] = user_id
+            self.topic_codes[position] = self._topic_code(topic)
+            self.events[position] = event
+            self.user_names[position] = user_name
+            self._next = (position + 1) % self.capacity
+            self._appended += 1
+            if self._size < self.capacity:
+                self._size += 1
+
+    def append_line(self, line):
+        """
+        Parse an audit trail log line and add its event.
+
+        Parameters
+        ----------
+        line: str
+            The audit trail log message, see parsers.parse_audit_trail_message
+
+        Raises
+        ------
+        ValueError
+            If the line isn't an audit trail message
+        """
+        output = parsers.parse_audit_trail_message(line, parse_time_stamp="epoch")
+        irods_user_id = output["irods_user_id"]
+        self.append(
+            int(irods_user_id) if irods_user_id else None,
+            output["topic"],
+            output["event"],
+            output["time_stamp"],
+            output["irods_user_name"],
+        )
+
+    def query(self, user_id=None, topic=None, start=None, end=None, limit=None):
+        """
+        Find the recent events, newest first.
+
+        Parameters
+        ----------
+        user_id: int|str
+            Only select the events of this user identifier number
+        topic: AuditTailTopics|str
+            Only select the events of this topic
+        start: int|float|datetime
+            The start of the time window (inclusive), unbounded if None
+        end: int|float|datetime
+            The end of the time window (exclusive), unbounded if None
+        limit: int
+            The maximum number of events returned
+
+        Returns
+        -------
+        list
+            The events, as dicts with the same keys as parsers.parse_audit_trail_message and the time_stamp as a
+            datetime object
+        """
+        start = _to_epoch(start)
+        end = _to_epoch(end)
+        user_id = None if user_id is None else int(user_id)
+        output = []
+        with self._lock:
+            if topic is not None:
+                topic_code = self._topic_index.get(loggers.format_topic(topic))
+                if topic_code is None:
+                    return output
+            oldest = self._next - self._size
+            if self._unordered_at > self._appended - self._size + 1:
+                # An out of order event is buffered after the oldest one: check the time of every event
+                first, last, check_time = 0, self._size, True
+            else:
+                first = 0 if start is None else self._bisect(oldest, start)
+                last = self._size if end is None else self._bisect(oldest, end)
+                check_time = False
+            for index in range(last - 1, first - 1, -1):
+                position = (oldest + index) % self.capacity
+                if check_time:
+                    time_stamp = self.time_stamps[position]
+                    if (start is not None and time_stamp < start) or (end is not None and time_stamp >= end):
+                        continue
+                if user_id is not None and self.user_ids[position] != user_id:
+                    continue
+                if topic is not None and self.topic_codes[position] != topic_code:
+                    continue
+                output.append(self._row(position))
+                if limit is not None and len(output) >= limit:
+                    break
+        return output
+
+    def _bisect(self, oldest, time_stamp):
+        """Find the index (from the oldest event) of the first event logged at or after time_stamp"""
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            if self.time_stamps[(oldest + middle) % self.capacity] < time_stamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _row(self, position):
+        user_name = self.user_names[position]
+        if user_name is not None:
+            irods_user_id = None
+        else:
+            user_id = self.user_ids[position]
+            irods_user_id = "" if user_id == MISSING_USER_ID else str(user_id)
+        return {
+            "time_stamp": datetime.fromtimestamp(self.time_stamps[position]),
+            "irods_user_id": irods_user_id,
+            "irods_user_name": user_name,
+            "topic": self.topics[self.topic_codes[position]],
+            "event": self.events[position],
+        }
+
+
+def _to_epoch(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return value.timestamp()
@@ -0,0 +1,161 @@
+"""This module contains an incremental reader following audit trail log files as they grow"""
+import base64
+import json
+import os
+import time
+
+from dhpythonirodsutils import parsers
+
+# Suffix given by logrotate to the most recently rotated log file
+ROTATED_SUFFIX = ".1"
+
+
+class AuditLogFollower:
+    """
+    Follow an audit trail log file, parsing only the bytes appended since the previous poll.
+
+    The position in the log (inode, byte offset and the bytes of an incomplete last line) can be persisted to a JSON
+    checkpoint file, so a new process resumes where the previous one stopped. Logrotate-style rotation (the log is
+    renamed and a new one created) and truncation (copytruncate) are detected.
+    """
+
+    def __init__(self, log_path, checkpoint_path=None, rotated_paths=None, parse_time_stamp=False, as_record=False):
+        """
+        Parameters
+        ----------
+        log_path: str|os.PathLike
+            The path to the audit log file
+        checkpoint_path: str|os.PathLike
+            The path to the JSON checkpoint file. If None, the position is only kept in memory.
+        rotated_paths: list
+            Where to look for the previous log file after a rotation, defaults to the log path + ROTATED_SUFFIX
+        parse_time_stamp: bool|str
+            How to decode time_stamp, see parsers.parse_audit_trail_message
+        as_record: bool
+            Whether to return compact AuditRecord objects instead of dicts
+        """
+        self.log_path = os.fspath(log_path)
+        self.checkpoint_path = checkpoint_path
+        if rotated_paths is None:
+            rotated_paths = [self.log_path + ROTATED_SUFFIX]
+        self.rotated_paths = rotated_paths
+        self.parse_time_stamp = parse_time_stamp
+        self.as_record = as_record
+
+        self.inode = None
+        self.device = None
+        self.offset = 0
+        self.partial_line = b""
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            self.load_checkpoint()
+
+    def poll(self):
+        """
+        Parse the audit trail messages appended to the log since the previous poll.
+
+        Returns
+        -------
+        list
+            The parsed audit logs, see parsers.parse_audit_trail_message
+        """
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            return []
+
+        output = []
+        if self.inode is not None and (stat.st_ino, stat.st_dev) != (self.inode, self.device):
+            # Rotated: finish the previous file first, if it can still be found
+            for rotated_path in self.rotated_paths:
+                try:
+                    rotated_stat = os.stat(rotated_path)
+                except FileNotFoundError:
+                    continue
+                if (rotated_stat.st_ino, rotated_stat.st_dev) == (self.inode, self.device):
+                    output.extend(self._read_appended(rotated_path, final=True))
+                    break
+            self._restart(stat)
+        elif stat.st_size < self.offset:
+            # Truncated in place
+            self._restart(stat)
+        elif self.inode is None:
+            self.inode = stat.st_ino
+            self.device = stat.st_dev
+
+        output.extend(self._read_appended(self.log_path))
+        if self.checkpoint_path is not None:
+            self.save_checkpoint()
+        return output
+
+    def follow(self, poll_interval=1.0):
+        """
+        Endlessly poll the log.
+
+        Parameters
+        ----------
+        poll_interval: float
+            The number of seconds to wait between two polls without new audit trail messages
+
+        Returns
+        -------
+        generator
+            Yield the parsed audit logs, as they are appended to the log
+        """
+        while True:
+            output = self.poll()
+            if not output:
+                time.sleep(poll_interval)
+            for item in output:
+                yield item
+
+    def _restart(self, stat):
+        self.inode = stat.st_ino
+        self.device = stat.st_dev
+        self.offset = 0
+        self.partial_line = b""
+
+    def _read_appended(self, path, final=False):
+        output = []
+        with open(path, "rb") as log_file:
+            log_file.seek(self.offset)
+            while True:
+                data = log_file.read(parsers.READ_CHUNK_SIZE)
+                if not data:
+                    break
+                self.offset += len(data)
+                data = self.partial_line + data
+                last_newline = data.rfind(b"\n")
+                self.partial_line = data[last_newline + 1 :]
+                if last_newline != -1:
+                    output.extend(self._parse(data[:last_newline]))
+        if final and self.partial_line:
+            # The rotated file won't grow anymore, its last line is complete
+            output.extend(self._parse(self.partial_line))
+            self.partial_line = b""
+        return output
+
+    def _parse(self, data):
+        lines = data.decode("utf-8", errors="replace").split("\n")
+        return parsers.iter_audit_trail_messages(lines, self.parse_time_stamp, as_record=self.as_record)
+
+    def save_checkpoint(self):
+        """Write the position in the log to the checkpoint file, atomically"""
+        checkpoint = {
+            "inode": self.inode,
+            "device": self.device,
+            "offset": self.offset,
+            "partial_line": base64.b64encode(self.partial_line).decode("ascii"),
+        }
+        temporary_path = os.fspath(self.checkpoint_path) + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def load_checkpoint(self):
+        """Read the position in the log from the checkpoint file"""
+        with open(self.checkpoint_path, "r", encoding="utf-8") as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        self.inode = checkpoint["inode"]
+        self.device = checkpoint["device"]
+        self.offset = checkpoint["offset"]
+        self.partial_line = base64.b64decode(checkpoint["partial_line"])
@@ -1,9 +1,11 @@
 """This module contains the helpers function to format diverse type of inputs"""
-import re
-
-from dhpythonirodsutils import validators, exceptions
+from dhpythonirodsutils import validators, exceptions, patterns
 from dhpythonirodsutils.enums import DropzoneState
 
+PROJECT_ID_IN_PATH = patterns.get_pattern("project_id_in_path")
+PROJECT_COLLECTION_IN_PATH = patterns.get_pattern("project_collection_in_path")
+COLLECTION_ID_IN_PATH = patterns.get_pattern("collection_id_in_path")
+
 
 def format_dropzone_path(token, dropzone_type):
     """
@@ -303,7 +305,7 @@ def get_project_id_from_project_path(project_path):
     -------
         The project id or None
     """
-    match = re.search(r"^(/nlmumc/projects/)?(?P<project>P[0-9]{9})/?$", project_path)
+    match = PROJECT_ID_IN_PATH.match(project_path)
     if match is not None:
         return match.group("project")
     raise exceptions.ValidationError("Invalid project path {}".format(project_path))
@@ -323,9 +325,7 @@ def get_project_id_from_project_collection_path(project_collection_path):
     str
         The project id or None
     """
-    match = re.search(
-        r"^(/nlmumc/projects/)?(?P<project>P[0-9]{9})/(?P<collection>C[0-9]{9})?/?", project_collection_path
-    )
+    match = PROJECT_COLLECTION_IN_PATH.match(project_collection_path)
     if match is not None:
         return match.group("project")
     raise exceptions.ValidationError("Invalid project collection path {}".format(project_collection_path))
@@ -350,9 +350,7 @@ def get_project_path_from_project_collection_path(project_collection_path):
     ValidationError
         Raises a ValidationError, if not a valid project path
     """
-    match = re.search(
-        r"^(/nlmumc/projects/)?(?P<project>P[0-9]{9})/(?P<collection>C[0-9]{9})?/?", project_collection_path
-    )
+    match = PROJECT_COLLECTION_IN_PATH.match(project_collection_path)
     if match is not None:
         return format_project_path(match.group("project"))
     raise exceptions.ValidationError("Invalid project collection path {}".format(project_collection_path))
@@ -372,9 +370,7 @@ def get_collection_id_from_project_collection_path(project_collection_path):
     str
         The collection id
     """
-    match = re.search(
-        r"^(/nlmumc/projects/)?(?P<project>P[0-9]{9})/?(?P<collection>C[0-9]{9})/?", project_collection_path
-    )
+    match = COLLECTION_ID_IN_PATH.match(project_collection_path)
     if match is not None:
         return match.group("collection")
     raise exceptions.ValidationError("Invalid project collection path {}".format(project_collection_path))
@@ -0,0 +1,401 @@
+"""This module contains a sidecar index over audit trail log files, to query them without a full scan"""
+import os
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime
+
+from dhpythonirodsutils import parsers
+from dhpythonirodsutils.enums import AuditTailTopics
+
+INDEX_SUFFIX = ".idx"
+# Approximate size (in bytes) of the log ranges referenced by the index
+INDEX_BLOCK_SIZE = 64 * 1024
+# Number of bytes at the start of the log used to detect if it was replaced
+FINGERPRINT_SIZE = 4096
+
+_MAGIC = b"DHAI"
+_VERSION = 1
+# magic, version, block size, indexed size, fingerprint, number of blocks, number of topics, number of users
+_HEADER = struct.Struct("<4sHIQIIII")
+# key length, number of blocks in the posting list
+_POSTING_HEADER = struct.Struct("<HI")
+
+
+class AuditLogIndex:
+    """
+    Index of an audit trail log file, stored in a binary sidecar file next to the log.
+
+    The log is divided into blocks of roughly block_size bytes, aligned on lines. For each block containing audit
+    trail messages, the index stores its byte range and its minimum and maximum time stamps. Posting lists map each
+    topic and each user (id or name) to the blocks in which they appear.
+    """
+
+    def __init__(self, log_path, index_path=None, block_size=INDEX_BLOCK_SIZE):
+        """
+        Parameters
+        ----------
+        log_path: str|os.PathLike
+            The path to the audit log file
+        index_path: str|os.PathLike
+            The path to the sidecar index file, defaults to the log path followed by INDEX_SUFFIX
+        block_size: int
+            The approximate size (in bytes) of the indexed blocks
+        """
+        self.log_path = log_path
+        self.index_path = os.fspath(index_path) if index_path is not None else os.fspath(log_path) + INDEX_SUFFIX
+        self.block_size = block_size
+        self.indexed_size = 0
+        self.fingerprint = 0
+        self.block_starts = array("q")
+        self.block_ends = array("q")
+        self.block_min_time_stamps = array("q")
+        self.block_max_time_stamps = array("q")
+        self.topic_postings = {}
+        self.user_postings = {}
+
+    def _reset(self):
+        self.indexed_size = 0
+        self.fingerprint = 0
+        self.block_starts = array("q")
+        self.block_ends = array("q")
+        self.block_min_time_stamps = array("q")
+        self.block_max_time_stamps = array("q")
+        self.topic_postings = {}
+        self.user_postings = {}
+
+    @classmethod
+    def open(cls, log_path, index_path=None, block_size=INDEX_BLOCK_SIZE, update=True):
+        """
+        Load the sidecar index of a log file, and bring it up to date.
+
+        The sidecar file is only a cache: if it isn't a valid index (e.g. corrupted, or written by another version),
+        the log is indexed again.
+
+        Parameters
+        ----------
+        log_path: str|os.PathLike
+            The path to the audit log file
+        index_path: str|os.PathLike
+            The path to the sidecar index file, defaults to the log path followed by INDEX_SUFFIX
+        block_size: int
+            The approximate size (in bytes) of the indexed blocks, if the index has to be created
+        update: bool
+            Whether to index the data appended to the log since the last update, and save the index
+
+        Returns
+        -------
+        AuditLogIndex
+            The index
+        """
+        index = cls(log_path, index_path, block_size)
+        rebuild = False
+        if os.path.exists(index.index_path):
+            try:
+                index.load()
+            except (ValueError, struct.error):
+                index._reset()
+                index.block_size = block_size
+                rebuild = True
+        if update and (index.update() or rebuild):
+            index.save()
+        return index
+
+    def update(self):
+        """
+        Index the data appended to the log since the last update.
+
+        The whole log is indexed again if it was truncated or replaced (e.g. rotated).
+
+        Returns
+        -------
+        bool
+            True, if the index changed
+        """
+        size = os.path.getsize(self.log_path)
+        reset = size < self.indexed_size or self._read_fingerprint(self.indexed_size) != self.fingerprint
+        if reset:
+            self._reset()
+        if size == self.indexed_size:
+            return reset
+
+        start_size = self.indexed_size
+        with open(self.log_path, "rb") as log_file:
+            log_file.seek(self.indexed_size)
+            self._index_lines(log_file)
+        self.fingerprint = self._read_fingerprint(self.indexed_size)
+        return reset or self.indexed_size != start_size
+
+    def _index_lines(self, log_file):
+        offset = self.indexed_size
+        block_start = offset
+        block_topics = set()
+        block_users = set()
+        min_time_stamp = max_time_stamp = None
+        for line in log_file:
+            if not line.endswith(b"\n"):
+                # Partial last line, it is indexed once complete
+                break
+            if line.startswith(b"[AUDIT_TRAIL]", parsers.AUDIT_TRAIL_TAG_OFFSET):
+                re_match = parsers.AUDIT_TRAIL_PATTERN.match(line.decode("utf-8", errors="replace"))
+                if re_match is not None:
+                    time_stamp = parsers.decode_time_stamp(re_match.group("time_stamp"), epoch=True)
+                    if min_time_stamp is None or time_stamp < min_time_stamp:
+                        min_time_stamp = time_stamp
+                    if max_time_stamp is None or time_stamp > max_time_stamp:
+                        max_time_stamp = time_stamp
+                    block_topics.add(re_match.group("topic"))
+                    block_users.add(_user_key(re_match.group("irods_user_id"), re_match.group("irods_user_name")))
+            offset += len(line)
+            if offset - block_start >= self.block_size:
+                self._add_block(block_start, offset, min_time_stamp, max_time_stamp, block_topics, block_users)
+                block_start = offset
+                block_topics = set()
+                block_users = set()
+                min_time_stamp = max_time_stamp = None
+        self._add_block(block_start, offset, min_time_stamp, max_time_stamp, block_topics, block_users)
+        self.indexed_size = offset
+
+    def _add_block(self, start, end, min_time_stamp, max_time_stamp, topics, users):
+        if min_time_stamp is None:
+            # No audit trail message in this block
+            return
+        block_id = len(self.block_starts)
+        self.block_starts.append(start)
+        self.block_ends.append(end)
+        self.block_min_time_stamps.append(min_time_stamp)
+        self.block_max_time_stamps.append(max_time_stamp)
+        for topic in topics:
+            self.topic_postings.setdefault(topic, array("I")).append(block_id)
+        for user in users:
+            self.user_postings.setdefault(user, array("I")).append(block_id)
+
+    def _read_fingerprint(self, size):
+        with open(self.log_path, "rb") as log_file:
+            return zlib.crc32(log_file.read(min(size, FINGERPRINT_SIZE)))
+
+    def save(self):
+        """Write the index to its sidecar file, atomically"""
+        temporary_path = self.index_path + ".tmp"
+        with open(temporary_path, "wb") as index_file:
+            index_file.write(
+                _HEADER.pack(
+                    _MAGIC,
+                    _VERSION,
+                    self.block_size,
+                    self.indexed_size,
+                    self.fingerprint,
+                    len(self.block_starts),
+                    len(self.topic_postings),
+                    len(self.user_postings),
+                )
+            )
+            for values in (self.block_starts, self.block_ends, self.block_min_time_stamps, self.block_max_time_stamps):
+                index_file.write(_to_little_endian(values).tobytes())
+            for postings in (self.topic_postings, self.user_postings):
+                for key, block_ids in postings.items():
+                    encoded_key = key.encode("utf-8")
+                    index_file.write(_POSTING_HEADER.pack(len(encoded_key), len(block_ids)))
+                    index_file.write(encoded_key)
+                    index_file.write(_to_little_endian(block_ids).tobytes())
+        os.replace(temporary_path, self.index_path)
+
+    def load(self):
+        """
+        Read the index from its sidecar file.
+
+        Raises
+        -------
+        ValueError
+            Raises a ValueError, if the file is not a valid index
+        """
+        with open(self.index_path, "rb") as index_file:
+            data = index_file.read()
+        if len(data) < _HEADER.size:
+            raise ValueError("Invalid audit log index {}".format(self.index_path))
+        (
+            magic,
+            version,
+            block_size,
+            indexed_size,
+            fingerprint,
+            block_count,
+            topic_count,
+            user_count,
+        ) = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Invalid audit log index {}".format(self.index_path))
+
+        self._reset()
+        self.block_size = block_size
+        self.indexed_size = indexed_size
+        self.fingerprint = fingerprint
+        offset = _HEADER.size
+        block_arrays = []
+        for _ in range(4):
+            values, offset = _read_array(data, offset, "q", block_count)
+            block_arrays.append(values)
+        self.block_starts, self.block_ends, self.block_min_time_stamps, self.block_max_time_stamps = block_arrays
+        for postings, count in ((self.topic_postings, topic_count), (self.user_postings, user_count)):
+            for _ in range(count):
+                key_length, posting_count = _POSTING_HEADER.unpack_from(data, offset)
+                offset += _POSTING_HEADER.size
+                key = data[offset : offset + key_length].decode("utf-8")
+                offset += key_length
+                postings[key], offset = _read_array(data, offset, "I", posting_count)
+
+    def candidate_blocks(self, topic=None, user=None, start=None, end=None):
+        """
+        Find the blocks which may contain audit logs matching all the given criteria.
+
+        Parameters
+        ----------
+        topic: AuditTailTopics|str
+            The topic of the audit logs
+        user: int|str
+            The user id or user name of the audit logs
+        start: datetime|str
+            The start of the time range (inclusive)
+        end: datetime|str
+            The end of the time range (exclusive)
+
+        Returns
+        -------
+        list
+            The sorted block ids
+        """
+        block_ids = None
+        if topic is not None:
+            if isinstance(topic, AuditTailTopics):
+                topic = topic.value
+            block_ids = set(self.topic_postings.get(topic, ()))
+        if user is not None:
+            user_block_ids = set(self.user_postings.get(str(user), ()))
+            block_ids = user_block_ids if block_ids is None else block_ids & user_block_ids
+        if block_ids is None:
+            block_ids = range(len(self.block_starts))
+
+        start = _to_epoch(start)
+        end = _to_epoch(end)
+        return sorted(
+            block_id
+            for block_id in block_ids
+            if (start is None or self.block_max_time_stamps[block_id] >= start)
+            and (end is None or self.block_min_time_stamps[block_id] < end)
+        )
+
+    def query(self, topic=None, user=None, start=None, end=None, parse_time_stamp=False):
+        """
+        Parse the audit logs matching all the given criteria, reading only the candidate blocks of the log.
+
+        Parameters
+        ----------
+        topic: AuditTailTopics|str
+            The topic of the audit logs
+        user: int|str
+            The user id or user name of the audit logs
+        start: datetime|str
+            The start of the time range (inclusive)
+        end: datetime|str
+            The end of the time range (exclusive)
+        parse_time_stamp: bool|str
+            How to decode time_stamp, see parsers.parse_audit_trail_message
+
+        Returns
+        -------
+        generator
+            Yield the matching parsed audit logs, in file order
+        """
+        user_id = user_name = None
+        if user is not None:
+            user = str(user)
+            # All-digit users are always parsed as user ids
+            if not user or user.isdecimal():
+                user_id = user
+            else:
+                user_name = user
+        with open(self.log_path, "rb") as log_file:
+            for range_start, range_end in self._merge_blocks(self.candidate_blocks(topic, user, start, end)):
+                log_file.seek(range_start)
+                lines = log_file.read(range_end - range_start).decode("utf-8", errors="replace").split("\n")
+                for output in parsers.iter_filtered_audit_trail_messages(
+                    lines, topic, user_id, user_name, start, end, parse_time_stamp
+                ):
+                    yield output
+
+    def _merge_blocks(self, block_ids):
+        """Merge the byte ranges of consecutive blocks, to read them at once"""
+        ranges = []
+        for block_id in block_ids:
+            block_start = self.block_starts[block_id]
+            block_end = self.block_ends[block_id]
+            if ranges and ranges[-1][1] == block_start:
+                ranges[-1][1] = block_end
+            else:
+                ranges.append([block_start, block_end])
+        return ranges
+
+
+def query_audit_log(log_path, topic=None, user=None, start=None, end=None, parse_time_stamp=False, index_path=None):
+    """
+    Query an audit log file through its sidecar index, creating or updating the index first if needed.
+
+    Parameters
+    ----------
+    log_path: str|os.PathLike
+        The path to the audit log file
+    topic: AuditTailTopics|str
+        The topic of the audit logs
+    user: int|str
+        The user id or user name of the audit logs
+    start: datetime|str
+        The start of the time range (inclusive)
+    end: datetime|str
+        The end of the time range (exclusive)
+    parse_time_stamp: bool|str
+        How to decode time_stamp, see parsers.parse_audit_trail_message
+    index_path: str|os.PathLike
+        The path to the sidecar index file, defaults to the log path followed by INDEX_SUFFIX
+
+    Returns
+    -------
+    generator
+        Yield the matching parsed audit logs, in file order
+    """
+    index = AuditLogIndex.open(log_path, index_path)
+    return index.query(topic, user, start, end, parse_time_stamp)
+
+
+def _user_key(irods_user_id, irods_user_name):
+    if irods_user_name is not None:
+        return irods_user_name
+    return irods_user_id
+
+
+def _to_epoch(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return parsers.decode_time_stamp(value, epoch=True)
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(value)
+
+
+def _to_little_endian(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+def _read_array(data, offset, typecode, count):
+    values = array(typecode)
+    end = offset + count * values.itemsize
+    if end > len(data):
+        raise ValueError("Truncated audit log index")
+    values.frombytes(data[offset:end])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values, end
@@ -1,8 +1,109 @@
 """This module contains the helpers function which standardize the way to log messages"""
 import datetime
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from json.encoder import encode_basestring
 
+from dhpythonirodsutils.enums import AuditTailTopics
 
-def format_log_message(severity, user, message):
+# Back-pressure policies of AuditTrailEmitter, when its queue is full
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP = "drop"
+OVERFLOW_COUNT = "count"
+EMITTER_QUEUE_SIZE = 10000
+EMITTER_BATCH_SIZE = 1000
+EMITTER_FLUSH_INTERVAL = 1.0
+
+# Queue markers of AuditTrailEmitter
+_FLUSH = object()
+_STOP = object()
+
+TIME_STAMP_FORMAT = "%Y-%m-%d %H:%M:%S%z"
+
+# Prebuilt key fragments of the JSON-lines format. The time stamp and the user id never need escaping.
+_JSON_TIME_STAMP = '{"time_stamp": "'
+_JSON_SEVERITY = '", "severity": '
+_JSON_USER = ', "user": '
+_JSON_MESSAGE = ', "message": '
+_JSON_AUDIT_TRAIL = '", "severity": "AUDIT_TRAIL", "irods_user_id": "'
+_JSON_TOPIC = '", "topic": '
+_JSON_EVENT = ', "event": '
+# Caches of the encoded severities and of the topic fragments (topic key, value and event key)
+JSON_CACHE_SIZE = 1024
+_JSON_SEVERITIES = {}
+_JSON_TOPICS = {}
+# Maximum number of per topic prefixes cached by each AuditTrailLogger
+PREFIX_CACHE_SIZE = 1024
+
+
+def _render_second(second):
+    return datetime.datetime.fromtimestamp(second).strftime(TIME_STAMP_FORMAT)
+
+
+class TimeStampClock:
+    """
+    Render the current time stamp of the log messages, caching the string for the current second.
+
+    strftime only runs when the second changes, every other call is a clock read and a comparison.
+    """
+
+    def __init__(self, now=time.time, render_second=_render_second):
+        """
+        Parameters
+        ----------
+        now: callable
+            Return the current time, as seconds since the epoch. Inject a fake clock for tests and benchmarks.
+        render_second: callable
+            Render a whole number of seconds since the epoch as a (local) time stamp, only called when the second
+            changes
+        """
+        self.now = now
+        self.render_second = render_second
+        self._cache = (None, "")
+
+    def time_stamp(self):
+        """
+        Returns
+        -------
+        str
+            The current (local) time stamp, e.g: "2023-01-12 09:40:16"
+        """
+        second = int(self.now())
+        cached_second, text = self._cache
+        if second != cached_second:
+            return self.render(second)
+        return text
+
+    def render(self, seconds):
+        """
+        Parameters
+        ----------
+        seconds: float
+            The time to render, as seconds since the epoch
+
+        Returns
+        -------
+        str
+            The (local) time stamp, e.g: "2023-01-12 09:40:16"
+        """
+        second = int(seconds)
+        cached_second, text = self._cache
+        if second != cached_second:
+            text = self.render_second(second)
+            # Single assignment, so concurrent readers never see a mismatched pair
+            self._cache = (second, text)
+        return text
+
+
+# Clock used by the format functions when none is given
+DEFAULT_CLOCK = TimeStampClock()
+
+
+def format_log_message(severity, user, message, clock=None):
     """
     Format a log message with variable severity
 
@@ -14,14 +115,18 @@ def format_log_message(severity, user, message):
         The user triggering the message.
     message: str
         The message to log.
+    clock: TimeStampClock
+        The clock rendering the time stamp, defaults to DEFAULT_CLOCK
 
     Returns
     -------
     str
         The string of the formatted log message.
     """
+    if clock is None:
+        clock = DEFAULT_CLOCK
     return "[%s] [%s] %s - %s" % (
-        datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S%z"),
+        clock.time_stamp(),
         severity.upper(),
         user,
         message,
@@ -66,7 +171,7 @@ def format_warning_message(user, message):
     return format_log_message("WARNING", user, message)
 
 
-def format_audit_trail_message(user_id, topic, event):
+def format_audit_trail_message(user_id, topic, event, clock=None):
     """
     Log an entry with AUDIT_TRAIL tag and user ID
 
@@ -74,10 +179,12 @@ def format_audit_trail_message(user_id, topic, event):
     ----------
     user_id: int
         The user identifier number.
-    topic: str
+    topic: AuditTailTopics|str
         The General topic for this log.
     event: str
         The event you want to be logged.
+    clock: TimeStampClock
+        The clock rendering the time stamp, defaults to DEFAULT_CLOCK
 
     Returns
     -------
@@ -86,9 +193,526 @@ def format_audit_trail_message(user_id, topic, event):
     """
     if not isinstance(user_id, int):
         user_id = ""
+    if clock is None:
+        clock = DEFAULT_CLOCK
     return "[%s][AUDIT_TRAIL][%s][%s] - %s" % (
-        datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S%z"),
+        clock.time_stamp(),
         str(user_id),
-        str(topic).upper(),
+        format_topic(topic),
         event,
     )
+
+
+def format_json_log_message(severity, user, message, clock=None):
+    """
+    Format a log message with variable severity as a single line JSON object, e.g:
+    {"time_stamp": "2022-05-03 16:12:12", "severity": "ERROR", "user": "rods", "message": "message"}
+
+    Parameters
+    ----------
+    severity: str
+        The severity of the log.
+    user: str
+        The user triggering the message.
+    message: str
+        The message to log.
+    clock: TimeStampClock
+        The clock rendering the time stamp, defaults to DEFAULT_CLOCK
+
+    Returns
+    -------
+    str
+        The JSON string of the log message.
+    """
+    if clock is None:
+        clock = DEFAULT_CLOCK
+    encoded_severity = _JSON_SEVERITIES.get(severity)
+    if encoded_severity is None:
+        encoded_severity = _cache_fragment(_JSON_SEVERITIES, severity, encode_basestring(severity.upper()))
+    return "".join(
+        (
+            _JSON_TIME_STAMP,
+            clock.time_stamp(),
+            _JSON_SEVERITY,
+            encoded_severity,
+            _JSON_USER,
+            encode_basestring(str(user)),
+            _JSON_MESSAGE,
+            encode_basestring(str(message)),
+            "}",
+        )
+    )
+
+
+def format_json_audit_trail_message(user_id, topic, event, clock=None):
+    """
+    Format an audit trail entry as a single line JSON object, with "AUDIT_TRAIL" as severity, e.g:
+    {"time_stamp": "2022-05-03 16:12:12", "severity": "AUDIT_TRAIL", "irods_user_id": "10043", "topic": "LOGIN",
+    "event": "event"}
+
+    Parameters
+    ----------
+    user_id: int
+        The user identifier number.
+    topic: AuditTailTopics|str
+        The General topic for this log.
+    event: str
+        The event you want to be logged.
+    clock: TimeStampClock
+        The clock rendering the time stamp, defaults to DEFAULT_CLOCK
+
+    Returns
+    -------
+    str
+        The JSON string of the audit trail log message.
+    """
+    if not isinstance(user_id, int):
+        user_id = ""
+    if clock is None:
+        clock = DEFAULT_CLOCK
+    topic_fragment = _JSON_TOPICS.get(topic)
+    if topic_fragment is None:
+        topic_fragment = _cache_fragment(_JSON_TOPICS, topic, _json_topic_fragment(topic))
+    return "".join(
+        (
+            _JSON_TIME_STAMP,
+            clock.time_stamp(),
+            _JSON_AUDIT_TRAIL,
+            str(user_id),
+            topic_fragment,
+            encode_basestring(str(event)),
+            "}",
+        )
+    )
+
+
+def _json_topic_fragment(topic):
+    return _JSON_TOPIC + encode_basestring(format_topic(topic)) + _JSON_EVENT
+
+
+def _cache_fragment(cache, key, fragment, size=JSON_CACHE_SIZE):
+    if len(cache) >= size:
+        cache.clear()
+    cache[key] = fragment
+    return fragment
+
+
+def format_topic(topic):
+    """
+    Normalize an audit trail topic, as written in the logs.
+
+    Parameters
+    ----------
+    topic: AuditTailTopics|str
+        The General topic for this log.
+
+    Returns
+    -------
+    str
+        The upper case topic, e.g: LOGIN
+    """
+    if isinstance(topic, AuditTailTopics):
+        topic = topic.value
+    return str(topic).upper()
+
+
+class AuditTrailLogger:
+    """
+    Audit trail formatter bound to a user, and optionally to a topic.
+
+    The static part of the line (tag, user id and topic) is built once, each call only splices in the time stamp and
+    the event. The output is the same as format_audit_trail_message, or format_json_audit_trail_message when
+    structured.
+    """
+
+    def __init__(self, user_id, topic=None, clock=None, structured=False):
+        """
+        Parameters
+        ----------
+        user_id: int
+            The user identifier number.
+        topic: AuditTailTopics|str
+            The topic used when none is given per call
+        clock: TimeStampClock
+            The clock rendering the time stamp, defaults to DEFAULT_CLOCK
+        structured: bool
+            Whether to format JSON lines instead of the bracketed text
+        """
+        if not isinstance(user_id, int):
+            user_id = ""
+        self.user_id = user_id
+        self.topic = topic
+        self.clock = DEFAULT_CLOCK if clock is None else clock
+        self.structured = structured
+        if structured:
+            self._user_prefix = _JSON_AUDIT_TRAIL + str(user_id)
+        else:
+            self._user_prefix = "][AUDIT_TRAIL][%s][" % user_id
+        self._prefixes = {}
+        if topic is not None:
+            self._default_prefix = self._prefix(topic)
+        else:
+            self._default_prefix = None
+
+    def _prefix(self, topic):
+        prefix = self._prefixes.get(topic)
+        if prefix is None:
+            if self.structured:
+                prefix = self._user_prefix + _json_topic_fragment(topic)
+            else:
+                prefix = self._user_prefix + format_topic(topic) + "] - "
+            _cache_fragment(self._prefixes, topic, prefix, PREFIX_CACHE_SIZE)
+        return prefix
+
+    def _topic_prefix(self, topic):
+        if topic is not None:
+            return self._prefix(topic)
+        if self._default_prefix is None:
+            raise ValueError("No topic given, and the logger is not bound to a topic")
+        return self._default_prefix
+
+    def format(self, event, topic=None):
+        """
+        Format a single audit trail log message.
+
+        Parameters
+        ----------
+        event: str
+            The event you want to be logged, other objects are converted with str.
+        topic: AuditTailTopics|str
+            The topic of this event, defaults to the bound topic
+
+        Returns
+        -------
+        str
+            The string of the formatted audit trail log message.
+
+        Raises
+        ------
+        ValueError
+            If no topic is given and the logger is not bound to a topic
+        """
+        if self.structured:
+            return "".join(
+                (
+                    _JSON_TIME_STAMP,
+                    self.clock.time_stamp(),
+                    self._topic_prefix(topic),
+                    encode_basestring(str(event)),
+                    "}",
+                )
+            )
+        return "[" + self.clock.time_stamp() + self._topic_prefix(topic) + str(event)
+
+    def format_many(self, events, topic=None):
+        """
+        Format several audit trail log messages, all with the same time stamp.
+
+        Parameters
+        ----------
+        events: iterable
+            The events you want to be logged.
+        topic: AuditTailTopics|str
+            The topic of these events, defaults to the bound topic
+
+        Returns
+        -------
+        list
+            The strings of the formatted audit trail log messages.
+
+        Raises
+        ------
+        ValueError
+            If no topic is given and the logger is not bound to a topic
+        """
+        if self.structured:
+            head = _JSON_TIME_STAMP + self.clock.time_stamp() + self._topic_prefix(topic)
+            return [head + encode_basestring(str(event)) + "}" for event in events]
+        head = "[" + self.clock.time_stamp() + self._topic_prefix(topic)
+        return [head + str(event) for event in events]
+
+
+class AuditTrailEmitter:
+    """
+    Non-blocking audit trail writer.
+
+    The messages are formatted in the calling thread, then put on a bounded queue. A background thread writes them
+    to the target in batches, so the caller only pays for the formatting and the enqueue.
+
+    Attributes:
+        dropped -- number of messages dropped because the queue was full
+        last_error -- the last exception raised while writing, or None
+    """
+
+    def __init__(
+        self,
+        target,
+        max_queue_size=EMITTER_QUEUE_SIZE,
+        batch_size=EMITTER_BATCH_SIZE,
+        flush_interval=EMITTER_FLUSH_INTERVAL,
+        overflow=OVERFLOW_BLOCK,
+        ring_buffer=None,
+    ):
+        """
+        Parameters
+        ----------
+        target: str|os.PathLike|file object
+            The path to the log file (opened in append mode), or a text stream
+        max_queue_size: int
+            The maximum number of messages waiting to be written
+        batch_size: int
+            The maximum number of messages written at once
+        flush_interval: float
+            The maximum number of seconds a message waits for its batch to fill up
+        overflow: str
+            What to do when the queue is full:
+                OVERFLOW_BLOCK: wait for the writer thread
+                OVERFLOW_DROP: drop the message
+                OVERFLOW_COUNT: drop the message, and log a warning with the number of dropped messages
+        ring_buffer: buffers.AuditTrailRingBuffer
+            Where the events passed to emit are also kept in memory, if set
+        """
+        if overflow not in (OVERFLOW_BLOCK, OVERFLOW_DROP, OVERFLOW_COUNT):
+            raise ValueError("Invalid overflow policy {}".format(overflow))
+        if isinstance(target, (str, bytes, os.PathLike)):
+            self._stream = open(target, "a", encoding="utf-8")  # pylint: disable=consider-using-with
+            self._owns_stream = True
+        else:
+            self._stream = target
+            self._owns_stream = False
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.ring_buffer = ring_buffer
+        self.dropped = 0
+        self.last_error = None
+        self._reported_dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._closed = False
+        self._queue = queue.Queue(max_queue_size)
+        self._writer = threading.Thread(target=self._write_batches, name="audit-trail-emitter", daemon=True)
+        self._writer.start()
+
+    def emit(self, user_id, topic, event):
+        """
+        Format an audit trail message and queue it, see format_audit_trail_message.
+
+        Parameters
+        ----------
+        user_id: int
+            The user identifier number.
+        topic: str
+            The General topic for this log.
+        event: str
+            The event you want to be logged.
+
+        Returns
+        -------
+        bool
+            True if the message was queued, False if it was dropped
+        """
+        if self.ring_buffer is not None:
+            self.ring_buffer.append(user_id, topic, event)
+        return self.emit_line(format_audit_trail_message(user_id, topic, event))
+
+    def emit_line(self, line):
+        """
+        Queue an already formatted log line.
+
+        Parameters
+        ----------
+        line: str
+            The log line, without line ending
+
+        Returns
+        -------
+        bool
+            True if the line was queued, False if it was dropped
+
+        Raises
+        ------
+        TypeError
+            If the line isn't a str
+        """
+        if self._closed:
+            raise ValueError("The audit trail emitter is closed")
+        if not isinstance(line, str):
+            raise TypeError("The audit trail line must be a str, not {}".format(type(line).__name__))
+        if self.overflow == OVERFLOW_BLOCK:
+            self._queue.put(line)
+            return True
+        try:
+            self._queue.put_nowait(line)
+            return True
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            return False
+
+    def flush(self):
+        """Wait until all the queued messages are written"""
+        if self._closed:
+            return
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self):
+        """Write the queued messages, stop the writer thread and close the log file if it was opened by the emitter"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._writer.join()
+        if self._owns_stream:
+            self._stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_batches(self):
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not _FLUSH and batch[-1] is not _STOP:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is _STOP
+            try:
+                self._write_batch(batch)
+            except Exception as error:  # pylint: disable=broad-except
+                # Keep the writer alive, so flush(), close() and the blocking emit don't wait forever
+                self.last_error = error
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch):
+        lines = [line for line in batch if line is not _FLUSH and line is not _STOP]
+        if self.overflow == OVERFLOW_COUNT and self.dropped != self._reported_dropped:
+            dropped = self.dropped
+            lines.append(
+                format_warning_message(
+                    "AuditTrailEmitter", "{} audit trail messages dropped".format(dropped - self._reported_dropped)
+                )
+            )
+            self._reported_dropped = dropped
+        if lines:
+            self._stream.write("\n".join(lines) + "\n")
+            self._stream.flush()
+
+
+class LogMessageFormatter(logging.Formatter):
+    """
+    logging.Formatter producing the format_log_message layout, e.g: [2022-05-03 16:12:12] [ERROR] rods - message
+
+    The severity is the level name of the record, the user is read from its "user" attribute
+    (e.g: logger.error("message", extra={"user": "rods"})). Tracebacks are appended on the following lines.
+    """
+
+    def __init__(self, default_user="", clock=None):
+        """
+        Parameters
+        ----------
+        default_user: str
+            The user of the records without "user" attribute
+        clock: TimeStampClock
+            The clock rendering the time stamp of the records, defaults to DEFAULT_CLOCK
+        """
+        super().__init__()
+        self.default_user = default_user
+        self.clock = DEFAULT_CLOCK if clock is None else clock
+
+    def format(self, record):
+        line = "[%s] [%s] %s - %s" % (
+            self.clock.render(record.created),
+            record.levelname.upper(),
+            getattr(record, "user", self.default_user),
+            record.getMessage(),
+        )
+        return _append_exception(self, record, line)
+
+
+class AuditTrailFormatter(logging.Formatter):
+    """
+    logging.Formatter producing the format_audit_trail_message layout,
+    e.g: [2022-05-03 16:12:12][AUDIT_TRAIL][10043][LOGIN] - event
+
+    The user id and the topic are read from the "user_id" and "topic" attributes of the record
+    (e.g: logger.info("event", extra={"user_id": 10043, "topic": AuditTailTopics.LOGIN})).
+    """
+
+    def __init__(self, default_topic="", clock=None):
+        """
+        Parameters
+        ----------
+        default_topic: AuditTailTopics|str
+            The topic of the records without "topic" attribute
+        clock: TimeStampClock
+            The clock rendering the time stamp of the records, defaults to DEFAULT_CLOCK
+        """
+        super().__init__()
+        self.default_topic = default_topic
+        self.clock = DEFAULT_CLOCK if clock is None else clock
+
+    def format(self, record):
+        user_id = getattr(record, "user_id", None)
+        if not isinstance(user_id, int):
+            user_id = ""
+        line = "[%s][AUDIT_TRAIL][%s][%s] - %s" % (
+            self.clock.render(record.created),
+            user_id,
+            format_topic(getattr(record, "topic", self.default_topic)),
+            record.getMessage(),
+        )
+        return _append_exception(self, record, line)
+
+
+def _append_exception(formatter, record, line):
+    """Append the traceback and stack info of a record, as logging.Formatter.format does"""
+    if record.exc_info and not record.exc_text:
+        record.exc_text = formatter.formatException(record.exc_info)
+    if record.exc_text:
+        line = line + "\n" + record.exc_text
+    if record.stack_info:
+        line = line + "\n" + formatter.formatStack(record.stack_info)
+    return line
+
+
+def setup_queue_logging(logger, handlers, max_queue_size=-1):
+    """
+    Route the records of a logger through a queue, so the logging threads never wait for the handlers' I/O.
+
+    A QueueHandler is added to the logger, and a started QueueListener passes the records to the handlers from a
+    background thread. Call stop() on the returned listener at shutdown, to write the remaining records.
+
+    Parameters
+    ----------
+    logger: logging.Logger|str
+        The logger, or its name
+    handlers: list
+        The handlers doing the actual output, e.g: a logging.handlers.RotatingFileHandler with an AuditTrailFormatter
+    max_queue_size: int
+        The maximum number of records waiting in the queue, unbounded if <= 0. The records logged while the queue is
+        full are dropped and reported through logging.Handler.handleError.
+
+    Returns
+    -------
+    logging.handlers.QueueListener
+        The started listener
+    """
+    if isinstance(logger, str):
+        logger = logging.getLogger(logger)
+    record_queue = queue.Queue(max_queue_size)
+    logger.addHandler(logging.handlers.QueueHandler(record_queue))
+    listener = logging.handlers.QueueListener(record_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -1,42 +1,1166 @@
-"""This module contains a parser helper function"""
+"""This module contains the parser helper functions for the log messages"""
+import bz2
+import gzip
+import heapq
+import io
+import json
+import lzma
+import mmap
+import os
+import queue
 import re
+import sys
+import threading
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import datetime
 
+from dhpythonirodsutils.enums import AuditTailTopics
+
 AUDIT_TRAIL_REGEX = (
     r"^\[(?P<time_stamp>\d{4}-\d{2}-\d{2}\s\d{2}:\d{2}:\d{2})\]\[AUDIT_TRAIL\]"
     r"(\[(?P<irods_user_id>\d*)\]|\[(?P<irods_user_name>\w*)\])\[(?P<topic>.*)\]\s-\s(?P<event>.*)$"
 )
+AUDIT_TRAIL_PATTERN = re.compile(AUDIT_TRAIL_REGEX)
+
+# Every audit trail line starts with "[YYYY-MM-DD HH:MM:SS]", so the tag is always found at the same offset
+AUDIT_TRAIL_TAG = "[AUDIT_TRAIL]"
+AUDIT_TRAIL_TAG_OFFSET = 21
+# The user field "[user]" starts right after the tag
+AUDIT_TRAIL_USER_OFFSET = AUDIT_TRAIL_TAG_OFFSET + len(AUDIT_TRAIL_TAG)
+
+LOG_MESSAGE_REGEX = (
+    r"^\[(?P<time_stamp>\d{4}-\d{2}-\d{2}\s\d{2}:\d{2}:\d{2})\]\s\[(?P<severity>\w*)\]"
+    r"\s(?P<user>.*?)\s-\s(?P<message>.*)$"
+)
+LOG_MESSAGE_PATTERN = re.compile(LOG_MESSAGE_REGEX)
+# The severity field "[SEVERITY]" of the format_log_message lines starts after the time stamp and a space
+LOG_MESSAGE_SEVERITY_OFFSET = 22
+# Pseudo severity selecting the audit trail lines in iter_any_log_messages
+AUDIT_TRAIL_SEVERITY = "AUDIT_TRAIL"
+# The JSON lines written by loggers start with {"time_stamp": "YYYY-MM-DD HH:MM:SS", "severity": "SEVERITY"
+JSON_SEVERITY_OFFSET = 50
+JSON_SEVERITY_KEY = '"severity": '
+
+# Size hint (in bytes) used when reading audit logs in chunks of lines
+READ_CHUNK_SIZE = 1024 * 1024
+# Size (in bytes) of the file ranges handed over to each worker process
+PARALLEL_CHUNK_SIZE = 16 * 1024 * 1024
 
+# Consecutive audit log lines mostly share the same second, so recently seen time stamps are remembered
+TIME_STAMP_CACHE_SIZE = 1024
+_VALID_TIME_STAMPS = set()
+_DATETIME_TIME_STAMPS = {}
+_EPOCH_TIME_STAMPS = {}
 
-def parse_audit_trail_message(message, parse_time_stamp=False):
+# Magic numbers of the compressed log formats, read transparently
+_COMPRESSION_OPENERS = (
+    (b"\x1f\x8b", gzip.open),
+    (b"BZh", bz2.open),
+    (b"\xfd7zXZ\x00", lzma.open),
+)
+# Number of chunks of lines decompressed ahead of the parsing
+READ_AHEAD_CHUNKS = 4
+
+
+def parse_audit_trail_message(message, parse_time_stamp=False, as_record=False):
     """
     Parameters
     ----------
     message: str
         Audit log message
-    parse_time_stamp: bool
-        Whether to parse time_stamp to a python datetime object or not
+    parse_time_stamp: bool|str
+        Whether to parse time_stamp to a python datetime object or not.
+        Use "epoch" to parse it to the number of seconds since the epoch (int) instead.
+    as_record: bool
+        Whether to return a compact AuditRecord instead of a dict
 
     Returns
     -------
-    dict
+    dict|AuditRecord
         Parsed audit log with following keys:
             time_stamp
             irods_user_id
             topic
             event
     """
-    re_match = re.match(AUDIT_TRAIL_REGEX, message)
-    if re_match:
-        output = {}
-        if parse_time_stamp:
-            output["time_stamp"] = datetime.strptime(re_match.group("time_stamp"), "%Y-%m-%d %H:%M:%S")
-        else:
-            output["time_stamp"] = re_match.group("time_stamp")
-        output["irods_user_id"] = re_match.group("irods_user_id")
-        output["irods_user_name"] = re_match.group("irods_user_name")
-        output["topic"] = re_match.group("topic")
-        output["event"] = re_match.group("event")
+    output = _parse_audit_trail_line(message, parse_time_stamp, as_record)
+    if output is not None:
         return output
 
     raise ValueError("No Match found. Unable to parse Audit log message")
+
+
+def iter_audit_trail_messages(source, parse_time_stamp=False, chunk_size=READ_CHUNK_SIZE, as_record=False):
+    """
+    Lazily parse all the audit trail messages found in a log source.
+
+    Lines without the AUDIT_TRAIL tag, or which do not match the audit trail format, are skipped silently.
+
+    Parameters
+    ----------
+    source: str|os.PathLike|file object|iterable
+        The path to a log file, an opened (text or binary) file object or an iterable of lines.
+        gzip, bz2 and xz compressed files are decompressed on the fly, in a separate reader thread.
+    parse_time_stamp: bool|str
+        Whether to parse time_stamp to a python datetime object or not.
+        Use "epoch" to parse it to the number of seconds since the epoch (int) instead.
+    chunk_size: int
+        The approximate number of bytes read at once from a file
+    as_record: bool
+        Whether to yield compact AuditRecord objects instead of dicts
+
+    Returns
+    -------
+    generator
+        Yield the parsed audit logs, see parse_audit_trail_message
+    """
+    for lines in _iter_line_chunks(source, chunk_size):
+        for line in lines:
+            if not line.startswith(AUDIT_TRAIL_TAG, AUDIT_TRAIL_TAG_OFFSET):
+                continue
+            output = _parse_audit_trail_line(line.rstrip("\r\n"), parse_time_stamp, as_record)
+            if output is not None:
+                yield output
+
+
+def iter_filtered_audit_trail_messages(
+    source,
+    topic=None,
+    user_id=None,
+    user_name=None,
+    start=None,
+    end=None,
+    parse_time_stamp=False,
+    chunk_size=READ_CHUNK_SIZE,
+    as_record=False,
+):
+    """
+    Lazily parse the audit trail messages of a log source matching all the given criteria.
+
+    The criteria are first checked on the raw line (fixed offsets and substring checks), so only the candidate lines
+    are fully parsed, before the criteria are checked again on the parsed values.
+
+    Parameters
+    ----------
+    source: str|os.PathLike|file object|iterable
+        See iter_audit_trail_messages
+    topic: AuditTailTopics|str|iterable
+        The topic, or a collection of topics, of the audit logs
+    user_id: int|str
+        The user identifier number of the audit logs
+    user_name: str
+        The user name of the audit logs
+    start: datetime|str
+        The start of the time range (inclusive), e.g: 2022-05-03 16:12:12
+    end: datetime|str
+        The end of the time range (exclusive)
+    parse_time_stamp: bool|str
+        Whether to parse time_stamp to a python datetime object or not.
+        Use "epoch" to parse it to the number of seconds since the epoch (int) instead.
+    chunk_size: int
+        The approximate number of bytes read at once from a file
+    as_record: bool
+        Whether to yield compact AuditRecord objects instead of dicts
+
+    Returns
+    -------
+    generator
+        Yield the matching parsed audit logs, see parse_audit_trail_message
+    """
+    topics = None
+    if topic is not None:
+        if isinstance(topic, (str, AuditTailTopics)):
+            topic = (topic,)
+        topics = frozenset(item.value if isinstance(item, AuditTailTopics) else item for item in topic)
+        topic_fragments = tuple("[{}]".format(item) for item in topics)
+    user_fragment = None
+    if user_id is not None:
+        user_id = str(user_id)
+        user_fragment = "[{}][".format(user_id)
+    if user_name is not None:
+        user_fragment = "[{}][".format(user_name)
+    # "YYYY-MM-DD HH:MM:SS" time stamps sort like the dates they represent
+    start = _format_time_stamp(start)
+    end = _format_time_stamp(end)
+
+    for lines in _iter_line_chunks(source, chunk_size):
+        for line in lines:
+            if not line.startswith(AUDIT_TRAIL_TAG, AUDIT_TRAIL_TAG_OFFSET):
+                continue
+            if user_fragment is not None and not line.startswith(user_fragment, AUDIT_TRAIL_USER_OFFSET):
+                continue
+            # The raw time stamp only compares like the time range with a space between the date and the time
+            standard_time_stamp = line[11:12] == " "
+            if standard_time_stamp and (
+                (start is not None and line[1:20] < start) or (end is not None and line[1:20] >= end)
+            ):
+                continue
+            if topics is not None and not any(fragment in line for fragment in topic_fragments):
+                continue
+
+            line = line.rstrip("\r\n")
+            output = _parse_audit_trail_line(line, False)
+            if (
+                output is None
+                or (topics is not None and output["topic"] not in topics)
+                or (user_id is not None and output["irods_user_id"] != user_id)
+                or (user_name is not None and output["irods_user_name"] != user_name)
+            ):
+                continue
+            if not standard_time_stamp and (start is not None or end is not None):
+                time_stamp = output["time_stamp"][:10] + " " + output["time_stamp"][11:]
+                if (start is not None and time_stamp < start) or (end is not None and time_stamp >= end):
+                    continue
+            if as_record:
+                yield AuditRecord.from_parsed_line(line, output, parse_time_stamp)
+                continue
+            if parse_time_stamp:
+                output["time_stamp"] = decode_time_stamp(output["time_stamp"], epoch=parse_time_stamp == "epoch")
+            yield output
+
+
+def merge_audit_trail_messages(sources, parse_time_stamp=False, deduplicate=False, as_record=False):
+    """
+    Merge the audit trail messages of several logs (e.g. written by different servers) into a single stream ordered by
+    time stamp.
+
+    Each source must be ordered by time stamp, as written by loggers.format_audit_trail_message. The sources are read
+    lazily and merged with a heap, so only one message per source is held in memory. Messages with the same time stamp
+    are yielded in the order of the sources.
+
+    Parameters
+    ----------
+    sources: list
+        The log sources, see iter_audit_trail_messages
+    parse_time_stamp: bool|str
+        Whether to parse time_stamp to a python datetime object or not.
+        Use "epoch" to parse it to the number of seconds since the epoch (int) instead.
+    deduplicate: bool
+        Whether to skip the messages identical to a message already yielded for the same time stamp
+    as_record: bool
+        Whether to yield compact AuditRecord objects instead of dicts
+
+    Returns
+    -------
+    generator
+        Yield the parsed audit logs, see parse_audit_trail_message
+    """
+    streams = [iter_audit_trail_messages(source, parse_time_stamp, as_record=as_record) for source in sources]
+    merged = heapq.merge(*streams, key=lambda output: output["time_stamp"])
+    if not deduplicate:
+        for output in merged:
+            yield output
+        return
+
+    current_time_stamp = None
+    seen = set()
+    for output in merged:
+        if output["time_stamp"] != current_time_stamp:
+            current_time_stamp = output["time_stamp"]
+            seen.clear()
+        key = (output["irods_user_id"], output["irods_user_name"], output["topic"], output["event"])
+        if key in seen:
+            continue
+        seen.add(key)
+        yield output
+
+
+def parse_log_message(message, parse_time_stamp=False):
+    """
+    Parse a log message written by loggers.format_log_message, e.g: [2022-05-03 16:12:12] [ERROR] rods - message
+
+    Parameters
+    ----------
+    message: str
+        Log message
+    parse_time_stamp: bool|str
+        Whether to parse time_stamp to a python datetime object or not.
+        Use "epoch" to parse it to the number of seconds since the epoch (int) instead.
+
+    Returns
+    -------
+    dict
+        Parsed log with following keys:
+            time_stamp
+            severity
+            user
+            message
+    """
+    output = _parse_log_line(message, parse_time_stamp)
+    if output is not None:
+        return output
+
+    raise ValueError("No Match found. Unable to parse log message")
+
+
+def parse_any_log_message(message, parse_time_stamp=False):
+    """
+    Parse either an audit trail message or a generic log message, depending on the bracket following the time stamp.
+
+    Parameters
+    ----------
+    message: str
+        Audit trail or generic log message
+    parse_time_stamp: bool|str
+        Whether to parse time_stamp to a python datetime object or not.
+        Use "epoch" to parse it to the number of seconds since the epoch (int) instead.
+
+    Returns
+    -------
+    dict
+        Parsed log, see parse_audit_trail_message (with a "topic" key) and parse_log_message (with a "severity" key)
+    """
+    if message.startswith(AUDIT_TRAIL_TAG, AUDIT_TRAIL_TAG_OFFSET):
+        return parse_audit_trail_message(message, parse_time_stamp)
+    return parse_log_message(message, parse_time_stamp)
+
+
+def iter_log_messages(source, severity=None, parse_time_stamp=False, chunk_size=READ_CHUNK_SIZE):
+    """
+    Lazily parse all the generic log messages found in a log source.
+
+    Parameters
+    ----------
+    source: str|os.PathLike|file object|iterable
+        See iter_audit_trail_messages
+    severity: str|iterable
+        Only parse the messages with this severity, or one of these severities, e.g: ("ERROR", "WARNING")
+    parse_time_stamp: bool|str
+        Whether to parse time_stamp to a python datetime object or not.
+        Use "epoch" to parse it to the number of seconds since the epoch (int) instead.
+    chunk_size: int
+        The approximate number of bytes read at once from a file
+
+    Returns
+    -------
+    generator
+        Yield the parsed logs, see parse_log_message
+    """
+    fragments = _severity_fragments(severity)
+    for lines in _iter_line_chunks(source, chunk_size):
+        for line in lines:
+            if not line.startswith(fragments, LOG_MESSAGE_SEVERITY_OFFSET):
+                continue
+            output = _parse_log_line(line.rstrip("\r\n"), parse_time_stamp)
+            if output is not None:
+                yield output
+
+
+def iter_any_log_messages(source, severity=None, parse_time_stamp=False, chunk_size=READ_CHUNK_SIZE):
+    """
+    Lazily parse all the audit trail and generic log messages found in a log source.
+
+    Parameters
+    ----------
+    source: str|os.PathLike|file object|iterable
+        See iter_audit_trail_messages
+    severity: str|iterable
+        Only parse the messages with this severity, or one of these severities. Use AUDIT_TRAIL_SEVERITY to select
+        the audit trail messages, e.g: ("ERROR", "AUDIT_TRAIL")
+    parse_time_stamp: bool|str
+        Whether to parse time_stamp to a python datetime object or not.
+        Use "epoch" to parse it to the number of seconds since the epoch (int) instead.
+    chunk_size: int
+        The approximate number of bytes read at once from a file
+
+    Returns
+    -------
+    generator
+        Yield the parsed logs, see parse_any_log_message
+    """
+    fragments = _severity_fragments(severity)
+    audit_trail = severity is None or "[{}]".format(AUDIT_TRAIL_SEVERITY) in fragments
+    for lines in _iter_line_chunks(source, chunk_size):
+        for line in lines:
+            if line.startswith(AUDIT_TRAIL_TAG, AUDIT_TRAIL_TAG_OFFSET):
+                if not audit_trail:
+                    continue
+                output = _parse_audit_trail_line(line.rstrip("\r\n"), parse_time_stamp)
+            elif line.startswith(fragments, LOG_MESSAGE_SEVERITY_OFFSET):
+                output = _parse_log_line(line.rstrip("\r\n"), parse_time_stamp)
+            else:
+                continue
+            if output is not None:
+                yield output
+
+
+def parse_json_log_message(message, parse_time_stamp=False):
+    """
+    Parse a JSON log line written by loggers.format_json_log_message or loggers.format_json_audit_trail_message.
+
+    Parameters
+    ----------
+    message: str
+        JSON log message
+    parse_time_stamp: bool|str
+        Whether to parse time_stamp to a python datetime object or not.
+        Use "epoch" to parse it to the number of seconds since the epoch (int) instead.
+
+    Returns
+    -------
+    dict
+        Parsed log, with the same keys as parse_audit_trail_message for the audit trail messages and as
+        parse_log_message otherwise
+
+    Raises
+    ------
+    ValueError
+        If the message isn't a JSON log message
+    """
+    output = _parse_json_line(message, parse_time_stamp)
+    if output is not None:
+        return output
+
+    raise ValueError("No Match found. Unable to parse JSON log message")
+
+
+def iter_json_log_messages(source, severity=None, parse_time_stamp=False, chunk_size=READ_CHUNK_SIZE):
+    """
+    Lazily parse all the JSON log messages found in a log source.
+
+    Parameters
+    ----------
+    source: str|os.PathLike|file object|iterable
+        See iter_audit_trail_messages
+    severity: str|iterable
+        Only parse the messages with this severity, or one of these severities. Use AUDIT_TRAIL_SEVERITY to select
+        the audit trail messages, e.g: ("ERROR", "AUDIT_TRAIL")
+    parse_time_stamp: bool|str
+        Whether to parse time_stamp to a python datetime object or not.
+        Use "epoch" to parse it to the number of seconds since the epoch (int) instead.
+    chunk_size: int
+        The approximate number of bytes read at once from a file
+
+    Returns
+    -------
+    generator
+        Yield the parsed logs, see parse_json_log_message
+    """
+    severities = None
+    if severity is not None:
+        if isinstance(severity, str):
+            severity = (severity,)
+        severities = frozenset(item.upper() for item in severity)
+        fragments = tuple(json.dumps(item) for item in severities)
+    key_offset = JSON_SEVERITY_OFFSET - len(JSON_SEVERITY_KEY)
+    for lines in _iter_line_chunks(source, chunk_size):
+        for line in lines:
+            if (
+                severities is not None
+                and not line.startswith(fragments, JSON_SEVERITY_OFFSET)
+                and line.startswith(JSON_SEVERITY_KEY, key_offset)
+            ):
+                # Written by loggers with another severity, skipped without decoding it. The lines with another
+                # layout are decoded and checked below.
+                continue
+            output = _parse_json_line(line, parse_time_stamp)
+            if output is None:
+                continue
+            # The parsed audit trail messages have no severity key
+            if severities is not None and output.get("severity", AUDIT_TRAIL_SEVERITY) not in severities:
+                continue
+            yield output
+
+
+def _parse_json_line(line, parse_time_stamp):
+    try:
+        output = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(output, dict) or "time_stamp" not in output or "severity" not in output:
+        return None
+    if output["severity"] == AUDIT_TRAIL_SEVERITY:
+        try:
+            output = {
+                "time_stamp": output["time_stamp"],
+                "irods_user_id": output["irods_user_id"],
+                "irods_user_name": None,
+                "topic": output["topic"],
+                "event": output["event"],
+            }
+        except KeyError:
+            return None
+    if parse_time_stamp:
+        output["time_stamp"] = decode_time_stamp(output["time_stamp"], epoch=parse_time_stamp == "epoch")
+    return output
+
+
+def _severity_fragments(severity):
+    """Build the prefixes expected at LOG_MESSAGE_SEVERITY_OFFSET for the given severities"""
+    if severity is None:
+        return ("[",)
+    if isinstance(severity, str):
+        severity = (severity,)
+    return tuple("[{}]".format(item.upper()) for item in severity)
+
+
+def _parse_log_line(line, parse_time_stamp):
+    re_match = LOG_MESSAGE_PATTERN.match(line)
+    if re_match is None:
+        return None
+    output = re_match.groupdict()
+    if parse_time_stamp:
+        output["time_stamp"] = decode_time_stamp(output["time_stamp"], epoch=parse_time_stamp == "epoch")
+    return output
+
+
+def _format_time_stamp(value):
+    if value is None or isinstance(value, str):
+        return value
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def parse_audit_trail_file_parallel(
+    path, parse_time_stamp=False, max_workers=None, chunk_size=PARALLEL_CHUNK_SIZE, ordered=True, as_record=False
+):
+    """
+    Parse all the audit trail messages of a (large) log file with a pool of worker processes.
+
+    The file is split into byte ranges aligned on line boundaries, and each range is parsed in a separate process.
+    Compressed files can't be split, so they are parsed sequentially with iter_audit_trail_messages.
+
+    Parameters
+    ----------
+    path: str|os.PathLike
+        The path to the log file
+    parse_time_stamp: bool|str
+        Whether to parse time_stamp to a python datetime object or not.
+        Use "epoch" to parse it to the number of seconds since the epoch (int) instead.
+    max_workers: int
+        The number of worker processes, defaults to the number of CPUs
+    chunk_size: int
+        The approximate number of bytes parsed by a worker at once
+    ordered: bool
+        If True, yield the messages in file order. Otherwise, yield each range as soon as it is parsed.
+    as_record: bool
+        Whether to yield compact AuditRecord objects instead of dicts
+
+    Returns
+    -------
+    generator
+        Yield the parsed audit logs, see parse_audit_trail_message
+    """
+    if get_compression_opener(path) is not None:
+        for output in iter_audit_trail_messages(path, parse_time_stamp, as_record=as_record):
+            yield output
+        return
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    # Limit the number of ranges in flight, so memory doesn't grow with the file size
+    max_pending = 2 * max_workers
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque() if ordered else set()
+        for start, end in split_file_ranges(path, chunk_size):
+            future = executor.submit(_parse_audit_trail_file_range, path, start, end, parse_time_stamp, as_record)
+            if ordered:
+                pending.append(future)
+                if len(pending) >= max_pending:
+                    for output in pending.popleft().result():
+                        yield output
+            else:
+                pending.add(future)
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        for output in future.result():
+                            yield output
+        if ordered:
+            while pending:
+                for output in pending.popleft().result():
+                    yield output
+        else:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for output in future.result():
+                        yield output
+
+
+def split_file_ranges(path, chunk_size):
+    """
+    Split a file into consecutive byte ranges of roughly chunk_size bytes, each ending on a line boundary.
+
+    Parameters
+    ----------
+    path: str|os.PathLike
+        The path to the file
+    chunk_size: int
+        The approximate size of a range in bytes
+
+    Returns
+    -------
+    generator
+        Yield (start, end) byte offsets, end being exclusive
+    """
+    size = os.path.getsize(path)
+    start = 0
+    with open(path, "rb") as log_file:
+        while start < size:
+            end = start + chunk_size
+            if end < size:
+                log_file.seek(end)
+                # Move the end of the range to the end of the current line
+                log_file.readline()
+                end = log_file.tell()
+            else:
+                end = size
+            yield start, end
+            start = end
+
+
+def _parse_audit_trail_file_range(path, start, end, parse_time_stamp, as_record):
+    """Worker function: parse the audit trail messages found between two byte offsets of a file"""
+    with open(path, "rb") as log_file:
+        log_file.seek(start)
+        data = log_file.read(end - start)
+    lines = data.decode("utf-8", errors="replace").split("\n")
+    return list(iter_audit_trail_messages(lines, parse_time_stamp, as_record=as_record))
+
+
+class _AuditMapping(Mapping):
+    """Read-only Mapping over the attributes named like the keys returned by parse_audit_trail_message"""
+
+    __slots__ = ()
+
+    FIELDS = ("time_stamp", "irods_user_id", "irods_user_name", "topic", "event")
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        fields = ", ".join("{}={!r}".format(key, self[key]) for key in self.FIELDS)
+        return "{}({})".format(self.__class__.__name__, fields)
+
+
+class AuditRecord(_AuditMapping):
+    """
+    Compact, read-only parsed audit log.
+
+    Only the original line and the parsed user and topic are stored; time_stamp and event are sliced out of the line
+    (and decoded) on access. Repeated user and topic strings are interned. An AuditRecord is a Mapping with the same
+    keys as the dict returned by parse_audit_trail_message, so record["topic"], record.get("event") or dict(record)
+    keep working, and a record compares equal to the equivalent dict.
+    """
+
+    __slots__ = ("_line", "_event_start", "_parse_time_stamp", "irods_user_id", "irods_user_name", "topic")
+
+    def __init__(self, line, event_start, irods_user_id, irods_user_name, topic, parse_time_stamp=False):
+        """
+        Parameters
+        ----------
+        line: str
+            The audit trail line, without line ending
+        event_start: int
+            The offset of the event in the line
+        irods_user_id: str|None
+            The user identifier number
+        irods_user_name: str|None
+            The user name
+        topic: str
+            The topic of the audit log
+        parse_time_stamp: bool|str
+            How to decode time_stamp, see parse_audit_trail_message
+        """
+        self._line = line
+        self._event_start = event_start
+        self._parse_time_stamp = parse_time_stamp
+        self.irods_user_id = irods_user_id
+        self.irods_user_name = irods_user_name
+        self.topic = topic
+
+    @classmethod
+    def from_parsed_line(cls, line, output, parse_time_stamp=False):
+        """
+        Build a record from an audit trail line and its parsed dict.
+
+        Parameters
+        ----------
+        line: str
+            The audit trail line
+        output: dict
+            The audit trail line parsed with time_stamp not decoded
+        parse_time_stamp: bool|str
+            How to decode time_stamp, see parse_audit_trail_message
+
+        Returns
+        -------
+        AuditRecord
+            The compact record
+        """
+        # The regex allows a final newline, which is not part of the event
+        if line.endswith("\n"):
+            line = line[:-1]
+        irods_user_id = output["irods_user_id"]
+        irods_user_name = output["irods_user_name"]
+        return cls(
+            line,
+            len(line) - len(output["event"]),
+            None if irods_user_id is None else sys.intern(irods_user_id),
+            None if irods_user_name is None else sys.intern(irods_user_name),
+            sys.intern(output["topic"]),
+            parse_time_stamp,
+        )
+
+    @property
+    def time_stamp(self):
+        """str|datetime|int: The time stamp, decoded according to parse_time_stamp"""
+        time_stamp = self._line[1:20]
+        if self._parse_time_stamp:
+            return decode_time_stamp(time_stamp, epoch=self._parse_time_stamp == "epoch")
+        return time_stamp
+
+    @property
+    def event(self):
+        """str: The logged event"""
+        return self._line[self._event_start :]
+
+
+class AuditTrailView(_AuditMapping):
+    """
+    Lazy view over an audit trail line of a memory-mapped log file, see iter_audit_trail_views.
+
+    The fields are memoryview slices of the line, only decoded when accessed. Like AuditRecord, a view is a Mapping
+    with the same keys as the dict returned by parse_audit_trail_message.
+    """
+
+    __slots__ = ("_line", "_user_end", "_topic_end", "_parse_time_stamp")
+
+    def __init__(self, line, user_end, topic_end, parse_time_stamp=False):
+        """
+        Parameters
+        ----------
+        line: memoryview
+            The audit trail line, without line ending
+        user_end: int
+            The offset of the "]" closing the user field
+        topic_end: int
+            The offset of the "] - " closing the topic field
+        parse_time_stamp: bool|str
+            How to decode time_stamp, see parse_audit_trail_message
+        """
+        self._line = line
+        self._user_end = user_end
+        self._topic_end = topic_end
+        self._parse_time_stamp = parse_time_stamp
+
+    @property
+    def time_stamp(self):
+        """str|datetime|int: The time stamp, decoded according to parse_time_stamp"""
+        time_stamp = str(self._line[1:20], "ascii")
+        if self._parse_time_stamp:
+            return decode_time_stamp(time_stamp, epoch=self._parse_time_stamp == "epoch")
+        return time_stamp
+
+    @property
+    def irods_user_id(self):
+        """str|None: The user identifier number"""
+        user = self._line[AUDIT_TRAIL_USER_OFFSET + 1 : self._user_end]
+        if user.nbytes == 0 or bytes(user).isdigit():
+            return str(user, "ascii")
+        return None
+
+    @property
+    def irods_user_name(self):
+        """str|None: The user name"""
+        user = self._line[AUDIT_TRAIL_USER_OFFSET + 1 : self._user_end]
+        if user.nbytes == 0 or bytes(user).isdigit():
+            return None
+        return str(user, "ascii")
+
+    @property
+    def topic(self):
+        """str: The topic"""
+        return str(self._line[self._user_end + 2 : self._topic_end], "utf-8", "replace")
+
+    @property
+    def event(self):
+        """str: The logged event"""
+        return str(self._line[self._topic_end + 4 :], "utf-8", "replace")
+
+
+def iter_audit_trail_views(path, parse_time_stamp=False):
+    """
+    Lazily parse the audit trail messages of a log file, without decoding the lines.
+
+    The file is memory-mapped and the AUDIT_TRAIL tags are searched directly in the bytes, so the lines without tag
+    are never copied nor decoded. The views reference the mapped file; decode the fields (or convert the views with
+    dict) to keep them after the iteration.
+
+    Parameters
+    ----------
+    path: str|os.PathLike
+        The path to the (uncompressed) log file
+    parse_time_stamp: bool|str
+        Whether to parse time_stamp to a python datetime object or not.
+        Use "epoch" to parse it to the number of seconds since the epoch (int) instead.
+
+    Returns
+    -------
+    generator
+        Yield AuditTrailView objects, or AuditRecord objects for the unusual lines needing the regex
+    """
+    tag = AUDIT_TRAIL_TAG.encode("ascii")
+    with open(path, "rb") as log_file:
+        if os.fstat(log_file.fileno()).st_size == 0:
+            return
+        mapped_file = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+    data = memoryview(mapped_file)
+    try:
+        position = mapped_file.find(tag)
+        while position != -1:
+            line_start = mapped_file.rfind(b"\n", 0, position) + 1
+            line_end = mapped_file.find(b"\n", position)
+            if line_end == -1:
+                line_end = len(mapped_file)
+            next_position = line_end
+            if mapped_file[line_end - 1 : line_end] == b"\r":
+                line_end -= 1
+
+            output = None
+            if position - line_start == AUDIT_TRAIL_TAG_OFFSET:
+                offsets = _split_audit_trail_bytes(mapped_file, line_start, line_end)
+                if offsets is not None:
+                    output = AuditTrailView(data[line_start:line_end], offsets[0], offsets[1], parse_time_stamp)
+            if output is None:
+                line = str(mapped_file[line_start:line_end], "utf-8", "replace")
+                output = _parse_audit_trail_line(line, parse_time_stamp, as_record=True)
+            if output is not None:
+                yield output
+            position = mapped_file.find(tag, next_position)
+    finally:
+        data.release()
+        try:
+            mapped_file.close()
+        except BufferError:
+            # Views are still referenced, the file is unmapped once they are garbage collected
+            pass
+
+
+def _split_audit_trail_bytes(data, line_start, line_end):
+    """
+    Bytes version of _split_audit_trail_line, working on the offsets of a line in a buffer.
+
+    Returns
+    -------
+    tuple|None
+        The offsets of the end of the user and of the end of the topic, relative to the line start, or None if the
+        line has to be parsed with the regex
+    """
+    time_stamp = data[line_start + 1 : line_start + 20]
+    if data[line_start : line_start + 1] != b"[" or data[line_start + 20 : line_start + 21] != b"]":
+        return None
+    if (
+        time_stamp[4::3] != b"-- ::"
+        or not time_stamp.replace(b"-", b"0").replace(b":", b"0").replace(b" ", b"0").isdigit()
+    ):
+        return None
+
+    user_start = line_start + AUDIT_TRAIL_USER_OFFSET
+    user_end = data.find(b"][", user_start, line_end)
+    if user_end == -1 or data[user_start : user_start + 1] != b"[":
+        return None
+    user = data[user_start + 1 : user_end]
+    if user and not user.isalnum():
+        return None
+    topic_end = data.rfind(b"] - ", user_end + 2, line_end)
+    if topic_end == -1:
+        return None
+    if data.find(b"]", topic_end + 4, line_end) != -1:
+        # A later "]\s-\s" using any other whitespace than a space would move the topic end in the regex
+        event = data[topic_end + 4 : line_end]
+        if not event.isascii() or not event.decode("ascii").isprintable():
+            return None
+    return user_end - line_start, topic_end - line_start
+
+
+def decode_time_stamp(time_stamp, epoch=False):
+    """
+    Decode a "YYYY-MM-DD HH:MM:SS" log time stamp, with the same result as datetime.strptime.
+
+    Decoded time stamps are remembered, since consecutive log lines mostly share the same second.
+
+    Parameters
+    ----------
+    time_stamp: str
+        The time stamp to decode, e.g: 2022-05-03 16:12:12
+    epoch: bool
+        If True, return the number of seconds since the epoch instead of a datetime object
+
+    Returns
+    -------
+    datetime|int
+        The decoded (naive, local) time stamp
+
+    Raises
+    -------
+    ValueError
+        Raises a ValueError, if the time stamp is not a valid date and time
+    """
+    cache = _EPOCH_TIME_STAMPS if epoch else _DATETIME_TIME_STAMPS
+    decoded = cache.get(time_stamp)
+    if decoded is None:
+        if time_stamp.isascii() and _is_time_stamp_layout(time_stamp):
+            decoded = datetime(
+                int(time_stamp[0:4]),
+                int(time_stamp[5:7]),
+                int(time_stamp[8:10]),
+                int(time_stamp[11:13]),
+                int(time_stamp[14:16]),
+                int(time_stamp[17:19]),
+            )
+        else:
+            # Leave the unusual cases (e.g. non-ASCII digits, other whitespace) to strptime
+            decoded = datetime.strptime(time_stamp, "%Y-%m-%d %H:%M:%S")
+        if epoch:
+            decoded = int(decoded.timestamp())
+        if len(cache) >= TIME_STAMP_CACHE_SIZE:
+            cache.clear()
+        cache[time_stamp] = decoded
+    return decoded
+
+
+def _parse_audit_trail_line(line, parse_time_stamp, as_record=False):
+    """
+    Parse a single audit trail line.
+
+    Returns
+    -------
+    dict|AuditRecord|None
+        The parsed audit log, or None if the line doesn't match the audit trail format
+    """
+    if not line.startswith(AUDIT_TRAIL_TAG, AUDIT_TRAIL_TAG_OFFSET):
+        return None
+    output = _split_audit_trail_line(line)
+    if output is None:
+        output = _match_audit_trail_line(line)
+        if output is None:
+            return None
+    if as_record:
+        return AuditRecord.from_parsed_line(line, output, parse_time_stamp)
+    if parse_time_stamp:
+        output["time_stamp"] = decode_time_stamp(output["time_stamp"], epoch=parse_time_stamp == "epoch")
+    return output
+
+
+def _split_audit_trail_line(line):
+    """
+    Parse an audit trail line with plain string slicing, based on the fixed layout written by
+    loggers.format_audit_trail_message: "[YYYY-MM-DD HH:MM:SS][AUDIT_TRAIL][user][TOPIC] - event".
+
+    The output is always identical to _match_audit_trail_line. Lines that can't be handled without the regex (unusual
+    whitespace, user names with underscores, embedded newlines, ...) are left to the regex.
+
+    Returns
+    -------
+    dict|None
+        The parsed audit log, or None if the line has to be parsed with the regex
+    """
+    if line[20:35] != "][AUDIT_TRAIL][" or line[:1] != "[":
+        return None
+    time_stamp = line[1:20]
+    if time_stamp not in _VALID_TIME_STAMPS:
+        if not _is_time_stamp_layout(time_stamp):
+            return None
+        if len(_VALID_TIME_STAMPS) >= TIME_STAMP_CACHE_SIZE:
+            _VALID_TIME_STAMPS.clear()
+        _VALID_TIME_STAMPS.add(time_stamp)
+
+    user_end = line.find("]", 35)
+    if user_end == -1 or line[user_end + 1 : user_end + 2] != "[" or "\n" in line:
+        return None
+    # The topic is greedy in the regex: the event starts after the last "] - "
+    topic_end = line.rfind("] - ", user_end + 2)
+    if topic_end == -1:
+        return None
+    event = line[topic_end + 4 :]
+    # A later "]\s-\s" using any other whitespace than a space would move the topic end in the regex
+    if "]" in event and not event.isprintable():
+        return None
+
+    user = line[35:user_end]
+    if not user or user.isdecimal():
+        irods_user_id = user
+        irods_user_name = None
+    elif user.isalnum():
+        irods_user_id = None
+        irods_user_name = user
+    else:
+        return None
+
+    return {
+        "time_stamp": time_stamp,
+        "irods_user_id": irods_user_id,
+        "irods_user_name": irods_user_name,
+        "topic": line[user_end + 2 : topic_end],
+        "event": event,
+    }
+
+
+def _is_time_stamp_layout(time_stamp):
+    """Check for the "YYYY-MM-DD HH:MM:SS" layout, i.e. separators at positions 4, 7, 10, 13 and 16 and digits"""
+    return (
+        len(time_stamp) == 19
+        and time_stamp[4::3] == "-- ::"
+        and time_stamp.replace("-", "0").replace(":", "0").replace(" ", "0").isdecimal()
+    )
+
+
+def _match_audit_trail_line(line):
+    """
+    Parse an audit trail line with AUDIT_TRAIL_REGEX.
+
+    Returns
+    -------
+    dict|None
+        The parsed audit log, or None if the line doesn't match the audit trail format
+    """
+    re_match = AUDIT_TRAIL_PATTERN.match(line)
+    if re_match is None:
+        return None
+    return re_match.groupdict()
+
+
+def get_compression_opener(path):
+    """
+    Detect if a file is compressed, based on its magic number.
+
+    Parameters
+    ----------
+    path: str|os.PathLike
+        The path to the file
+
+    Returns
+    -------
+    callable|None
+        The function opening the file (gzip.open, bz2.open or lzma.open), or None if the file is not compressed
+    """
+    with open(path, "rb") as log_file:
+        header = log_file.read(6)
+    for magic, opener in _COMPRESSION_OPENERS:
+        if header.startswith(magic):
+            return opener
+    return None
+
+
+def _iter_line_chunks(source, chunk_size):
+    """
+    Read the lines of a log source in chunks of roughly chunk_size bytes.
+
+    Parameters
+    ----------
+    source: str|os.PathLike|file object|iterable
+        The path to a log file, an opened (text or binary) file object or an iterable of lines
+    chunk_size: int
+        The approximate number of bytes read at once from a file
+
+    Returns
+    -------
+    generator
+        Yield lists of text lines
+    """
+    if isinstance(source, (str, bytes, os.PathLike)):
+        opener = get_compression_opener(source)
+        if opener is not None:
+            for lines in _iter_read_ahead(_iter_compressed_line_chunks(source, opener, chunk_size)):
+                yield lines
+            return
+        with open(source, "r", encoding="utf-8", errors="replace", newline="\n", buffering=chunk_size) as log_file:
+            for lines in _iter_file_line_chunks(log_file, chunk_size):
+                yield lines
+    elif isinstance(source, io.TextIOBase):
+        for lines in _iter_file_line_chunks(source, chunk_size):
+            yield lines
+    elif hasattr(source, "read"):
+        # Binary file object, decode it without closing the underlying file
+        text_file = io.TextIOWrapper(source, encoding="utf-8", errors="replace", newline="\n")
+        try:
+            for lines in _iter_file_line_chunks(text_file, chunk_size):
+                yield lines
+        finally:
+            text_file.detach()
+    else:
+        yield source
+
+
+def _iter_compressed_line_chunks(path, opener, chunk_size):
+    with opener(path, "rb") as compressed_file:
+        buffered_file = io.BufferedReader(compressed_file, buffer_size=chunk_size)
+        with io.TextIOWrapper(buffered_file, encoding="utf-8", errors="replace", newline="\n") as log_file:
+            for lines in _iter_file_line_chunks(log_file, chunk_size):
+                yield lines
+
+
+def _iter_read_ahead(chunks, max_chunks=READ_AHEAD_CHUNKS):
+    """
+    Consume an iterator in a separate thread, a few items ahead of the caller.
+
+    zlib, bz2 and lzma release the GIL while decompressing, so reading a compressed file in a thread overlaps the
+    decompression with the parsing.
+
+    Parameters
+    ----------
+    chunks: iterator
+        The iterator to consume, closed in the reader thread
+    max_chunks: int
+        The maximum number of items waiting for the caller
+
+    Returns
+    -------
+    generator
+        Yield the items of the iterator
+    """
+    chunk_queue = queue.Queue(max_chunks)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                chunk_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def read():
+        try:
+            for chunk in chunks:
+                if not put((chunk, None)):
+                    return
+            put((None, None))
+        except Exception as error:  # pylint: disable=broad-except
+            # Raised again in the caller thread
+            put((None, error))
+        finally:
+            chunks.close()
+
+    reader = threading.Thread(target=read, name="audit-log-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            chunk, error = chunk_queue.get()
+            if error is not None:
+                raise error
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        stopped.set()
+        reader.join()
+
+
+def _iter_file_line_chunks(text_file, chunk_size):
+    while True:
+        lines = text_file.readlines(chunk_size)
+        if not lines:
+            return
+        yield lines
@@ -0,0 +1,103 @@
+"""This module contains the registry of the compiled regular expressions used by the validators and formatters"""
+import re
+import timeit
+
+# Sources of the registered patterns. The ID and path checks are meant to be applied with fullmatch, the path
+# extractors with match (both anchor at the start of the string, so the patterns don't repeat "^").
+PATTERN_SOURCES = {
+    "project_id": r"P[0-9]{9}",
+    "collection_id": r"C[0-9]{9}",
+    "project_path": r"/nlmumc/projects/P[0-9]{9}",
+    "project_collection_path": r"/nlmumc/projects/P[0-9]{9}/C[0-9]{9}",
+    "file_path": r"/nlmumc/projects/P[0-9]{9}/C[0-9]{9}/",
+    # The dropzone token format
+    "dropzone": r"\w+-\w+",
+    # All the budget number formats in one alternation: UM-{10digits}, UM-{11digits}{A-Z},
+    # UM-{A-Z}/{11digits}{A-Z}.{3digits}, AZM-{6digits} and XXXXXXXXX if not specified
+    "budget_number": r"UM-(?:\d{10}|\d{11}[A-Z]|[A-Z]/\d{11}[A-Z]\.\d{3})|AZM-\d{6}|XXXXXXXXX",
+    "project_id_in_path": r"(/nlmumc/projects/)?(?P<project>P[0-9]{9})/?$",
+    "project_collection_in_path": r"(/nlmumc/projects/)?(?P<project>P[0-9]{9})/(?P<collection>C[0-9]{9})?/?",
+    "collection_id_in_path": r"(/nlmumc/projects/)?(?P<project>P[0-9]{9})/?(?P<collection>C[0-9]{9})/?",
+}
+
+_COMPILED_PATTERNS = {}
+
+
+def get_pattern(name):
+    """
+    Get a registered pattern, compiling it on first use.
+
+    Parameters
+    ----------
+    name: str
+        The name of the pattern in PATTERN_SOURCES
+
+    Returns
+    -------
+    re.Pattern
+        The compiled pattern
+    """
+    pattern = _COMPILED_PATTERNS.get(name)
+    if pattern is None:
+        pattern = _COMPILED_PATTERNS[name] = re.compile(PATTERN_SOURCES[name])
+    return pattern
+
+
+def warm_patterns(names=None):
+    """
+    Compile the registered patterns ahead of time, e.g: before forking worker processes.
+
+    Parameters
+    ----------
+    names: iterable
+        The names of the patterns to compile, all of them if None
+    """
+    for name in PATTERN_SOURCES if names is None else names:
+        get_pattern(name)
+
+
+def benchmark(number=100000):
+    """
+    Compare the per-call cost of passing raw pattern strings to the re functions with the registry patterns.
+
+    Parameters
+    ----------
+    number: int
+        The number of calls timed per case
+
+    Returns
+    -------
+    dict
+        Per case, the (raw, registry) number of microseconds per call
+    """
+    warm_patterns()
+    project_id = get_pattern("project_id")
+    budget_number = get_pattern("budget_number")
+    project_collection_in_path = get_pattern("project_collection_in_path")
+    value = "/nlmumc/projects/P000000001/C000000001"
+
+    def raw_budget_number():
+        return (
+            re.fullmatch(r"^UM-\d{10}$", "XXXXXXXXX")
+            or re.fullmatch(r"^UM-\d{11}[A-Z]$", "XXXXXXXXX")
+            or re.fullmatch(r"^UM-[A-Z]/\d{11}[A-Z]\.\d{3}$", "XXXXXXXXX")
+            or re.fullmatch(r"^AZM-\d{6}$", "XXXXXXXXX")
+            or re.fullmatch(r"^XXXXXXXXX$", "XXXXXXXXX")
+        )
+
+    cases = {
+        "project_id": (
+            lambda: re.search("^P[0-9]{9}$", "P000000001"),
+            lambda: project_id.fullmatch("P000000001"),
+        ),
+        "budget_number": (raw_budget_number, lambda: budget_number.fullmatch("XXXXXXXXX")),
+        "project_collection_in_path": (
+            lambda: re.search(r"^(/nlmumc/projects/)?(?P<project>P[0-9]{9})/(?P<collection>C[0-9]{9})?/?", value),
+            lambda: project_collection_in_path.match(value),
+        ),
+    }
+    return {
+        case: tuple(min(timeit.repeat(function, number=number, repeat=3)) / number * 1e6 for function in functions)
+        for case, functions in cases.items()
+    }
+
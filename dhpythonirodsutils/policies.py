@@ -0,0 +1,232 @@
+"""This module contains the sampling, rate limiting and de-duplication policy applied before logging audit trails"""
+import random
+import threading
+import time
+
+from dhpythonirodsutils import loggers
+from dhpythonirodsutils.enums import AuditTailTopics
+
+# Topics which are always logged, whatever the policy configuration
+SECURITY_TOPICS = frozenset(
+    topic.value
+    for topic in (
+        AuditTailTopics.CHANGE_PROJECT_PERMISSIONS,
+        AuditTailTopics.COPY_WEBDAV_DATA,
+        AuditTailTopics.DELETE_COLLECTION,
+        AuditTailTopics.DELETE_DROPZONE,
+        AuditTailTopics.DELETE_PROJECT,
+        AuditTailTopics.DOWNLOAD_DATA,
+        AuditTailTopics.LOGIN,
+        AuditTailTopics.POLICY,
+    )
+)
+REPEATED_EVENT_FORMAT = "{} [repeated {} times]"
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter: allows bursts of up to capacity events, refilled at rate events per second.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        """
+        Parameters
+        ----------
+        rate: float
+            The number of tokens added per second
+        capacity: float
+            The maximum number of tokens, i.e. the largest burst allowed
+        clock: callable
+            Return the current time in seconds, from a monotonic clock
+        """
+        if rate <= 0 or capacity < 1:
+            raise ValueError("A token bucket needs a positive rate and a capacity of at least 1")
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.last_refill = clock()
+
+    def consume(self):
+        """
+        Take one token, if available.
+
+        Returns
+        -------
+        bool
+            True if the event is allowed
+        """
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class AuditTrailPolicy:
+    """
+    Decide which audit trail messages get logged, for the high-volume topics.
+
+    Per topic, a message is first sampled (kept with the configured probability), then rate limited by a token
+    bucket. Identical messages (same user, topic and event) logged within dedup_window seconds are collapsed: the
+    first one is logged, the following ones are only counted and reported in a single "[repeated N times]" line once
+    the window is over. The SECURITY_TOPICS, and the extra protected_topics, bypass the policy entirely.
+
+    Attributes:
+        dropped -- number of messages dropped (sampled out or rate limited) per topic
+    """
+
+    def __init__(
+        self,
+        sample_rates=None,
+        rate_limits=None,
+        dedup_window=None,
+        protected_topics=(),
+        clock=time.monotonic,
+        random_source=random.random,
+        time_stamp_clock=None,
+    ):
+        """
+        Parameters
+        ----------
+        sample_rates: dict
+            The fraction (0 to 1) of the messages to keep, per topic (AuditTailTopics or str)
+        rate_limits: dict
+            (rate, capacity) token bucket settings per topic, see TokenBucket
+        dedup_window: float
+            The number of seconds during which identical messages are collapsed. None disables the de-duplication.
+        protected_topics: iterable
+            Topics never dropped nor collapsed, in addition to SECURITY_TOPICS
+        clock: callable
+            Return the current time in seconds, from a monotonic clock
+        random_source: callable
+            Return a random float in [0, 1), for the sampling
+        time_stamp_clock: loggers.TimeStampClock
+            The clock rendering the time stamps of the formatted lines, defaults to loggers.DEFAULT_CLOCK
+        """
+        self.sample_rates = {}
+        for topic, rate in (sample_rates or {}).items():
+            if not 0 <= rate <= 1:
+                raise ValueError("The sample rate of {} must be between 0 and 1".format(topic))
+            self.sample_rates[loggers.format_topic(topic)] = rate
+        self.buckets = {
+            loggers.format_topic(topic): TokenBucket(rate, capacity, clock)
+            for topic, (rate, capacity) in (rate_limits or {}).items()
+        }
+        self.dedup_window = dedup_window
+        self.protected_topics = SECURITY_TOPICS | {loggers.format_topic(topic) for topic in protected_topics}
+        self.clock = clock
+        self.random_source = random_source
+        self.time_stamp_clock = time_stamp_clock
+        self.dropped = {}
+
+        # (user_id, topic, event) -> [window end, repeat count]
+        self._recent = {}
+        self._next_sweep = None
+        self._lock = threading.Lock()
+
+    def allow(self, topic):
+        """
+        Apply the sampling and the rate limit of a topic, without de-duplication.
+
+        Parameters
+        ----------
+        topic: AuditTailTopics|str
+            The topic of the message
+
+        Returns
+        -------
+        bool
+            True if the message should be logged
+        """
+        key = loggers.format_topic(topic)
+        if key in self.protected_topics:
+            return True
+        with self._lock:
+            return self._allow(key)
+
+    def _allow(self, key):
+        sample_rate = self.sample_rates.get(key)
+        allowed = sample_rate is None or self.random_source() < sample_rate
+        if allowed:
+            bucket = self.buckets.get(key)
+            allowed = bucket is None or bucket.consume()
+        if not allowed:
+            self.dropped[key] = self.dropped.get(key, 0) + 1
+        return allowed
+
+    def format_message(self, user_id, topic, event):
+        """
+        Apply the policy to an audit trail message, see loggers.format_audit_trail_message.
+
+        Parameters
+        ----------
+        user_id: int
+            The user identifier number.
+        topic: AuditTailTopics|str
+            The General topic for this log.
+        event: str
+            The event you want to be logged.
+
+        Returns
+        -------
+        list
+            The formatted lines to log: empty if the message is dropped or collapsed, and possibly preceded by the
+            "[repeated N times]" lines of the de-duplication windows which just ended.
+        """
+        key = loggers.format_topic(topic)
+        with self._lock:
+            now = self.clock()
+            lines = self._expire_lines(now)
+            if key in self.protected_topics:
+                lines.append(self._format(user_id, key, event))
+                return lines
+            if self.dedup_window is not None:
+                recent = self._recent.get((user_id, key, event))
+                if recent is not None:
+                    recent[1] += 1
+                    return lines
+            if not self._allow(key):
+                return lines
+            if self.dedup_window is not None:
+                window_end = now + self.dedup_window
+                self._recent[(user_id, key, event)] = [window_end, 0]
+                if self._next_sweep is None or window_end < self._next_sweep:
+                    self._next_sweep = window_end
+            lines.append(self._format(user_id, key, event))
+            return lines
+
+    def flush(self):
+        """
+        End all the de-duplication windows.
+
+        Returns
+        -------
+        list
+            The formatted "[repeated N times]" lines of the collapsed messages
+        """
+        with self._lock:
+            return self._expire_lines(None)
+
+    def _expire_lines(self, now):
+        """Remove the ended de-duplication windows (all of them if now is None), and format their repeat lines"""
+        # _next_sweep is the earliest window end, set whenever _recent isn't empty
+        if not self._recent or (now is not None and now < self._next_sweep):
+            return []
+        lines = []
+        next_sweep = None
+        for recent_key, (window_end, count) in list(self._recent.items()):
+            if now is None or window_end <= now:
+                del self._recent[recent_key]
+                if count:
+                    user_id, key, event = recent_key
+                    lines.append(self._format(user_id, key, REPEATED_EVENT_FORMAT.format(event, count)))
+            elif next_sweep is None or window_end < next_sweep:
+                next_sweep = window_end
+        self._next_sweep = next_sweep
+        return lines
+
+    def _format(self, user_id, topic, event):
+        return loggers.format_audit_trail_message(user_id, topic, event, self.time_stamp_clock)
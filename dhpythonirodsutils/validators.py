@@ -1,11 +1,124 @@
 """This module contains the helpers function to validate diverse type of inputs"""
-import os
-import re
 from itertools import takewhile
 
-from dhpythonirodsutils import exceptions
+from dhpythonirodsutils import exceptions, patterns
 from dhpythonirodsutils.enums import ProjectCollectionActions
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+def _match_pattern(name, method="fullmatch"):
+    """Build a predicate checking that a value is a string matching a registry pattern (compiled now)"""
+    match = getattr(patterns.get_pattern(name), method)
+
+    def is_valid(value):
+        return isinstance(value, str) and match(value) is not None
+
+    return is_valid
+
+
+def _one_of(values):
+    """Build a predicate checking that a value is one of values"""
+
+    def is_valid(value):
+        return value in values
+
+    return is_valid
+
+
+def _any_of(*predicates):
+    """Build a predicate checking that a value passes at least one of predicates"""
+
+    def is_valid(value):
+        return any(predicate(value) for predicate in predicates)
+
+    return is_valid
+
+
+def _is_version_number(version):
+    return isinstance(version, int) or (isinstance(version, str) and version.isdigit())
+
+
+# Declarative table of the single value validations: name -> (predicate, failure reason formatted with the value).
+# Both the is_valid_<name> predicates and the validate_<name> functions are derived from it.
+VALIDATION_SPECS = {
+    "project_id": (_match_pattern("project_id"), "Invalid project id {}"),
+    "project_path": (_match_pattern("project_path"), "Invalid project path {}"),
+    "collection_id": (_match_pattern("collection_id"), "Invalid collection id {}"),
+    "project_collection_path": (_match_pattern("project_collection_path"), "Invalid project collection path {}"),
+    "file_path": (_match_pattern("file_path", "match"), "Invalid file path {}"),
+    "dropzone_type": (_one_of(("mounted", "direct")), "Invalid dropzone type {}"),
+    "dropzone_token": (_match_pattern("dropzone"), "Invalid dropzone token{}"),
+    "metadata_version_number": (_is_version_number, "Invalid version number {}"),
+    "string_boolean": (_one_of(("true", "false")), "Invalid boolean as string '{}'"),
+    "budget_number": (_match_pattern("budget_number"), "Invalid budget number as string '{}'"),
+    "project_collection_action_name": (
+        _one_of(ProjectCollectionActions.__members__),
+        "Invalid ProjectCollectionActions '{}'",
+    ),
+    "project_collections_action_avu": (
+        _one_of([action.value for action in ProjectCollectionActions]),
+        "Invalid ProjectCollectionActions AVU '{}'",
+    ),
+}
+VALIDATION_SPECS["irods_collection"] = (
+    _any_of(VALIDATION_SPECS["project_collection_path"][0], VALIDATION_SPECS["project_path"][0]),
+    "Invalid irods collection path {}",
+)
+
+_PREDICATE_DOC = """
+    Check the {0}, without raising an exception, see validate_{1}.
+
+    Parameters
+    ----------
+    value:
+        The value to check
+
+    Returns
+    -------
+    bool
+        True if valid, False if not
+    """
+
+
+def _make_predicate(name):
+    """Build the is_valid_<name> predicate of a VALIDATION_SPECS entry"""
+    is_valid = VALIDATION_SPECS[name][0]
+
+    def predicate(value):
+        return is_valid(value)
+
+    predicate.__name__ = "is_valid_" + name
+    predicate.__qualname__ = predicate.__name__
+    predicate.__doc__ = _PREDICATE_DOC.format(name.replace("_", " "), name)
+    return predicate
+
+
+def _validate(name, value):
+    """Return True if the value is valid, raise a ValidationError with the reason of the spec otherwise"""
+    is_valid, reason = VALIDATION_SPECS[name]
+    if is_valid(value):
+        return True
+    raise exceptions.ValidationError(reason.format(value))
+
+
+is_valid_project_id = _make_predicate("project_id")
+is_valid_project_path = _make_predicate("project_path")
+is_valid_collection_id = _make_predicate("collection_id")
+is_valid_project_collection_path = _make_predicate("project_collection_path")
+is_valid_file_path = _make_predicate("file_path")
+is_valid_dropzone_type = _make_predicate("dropzone_type")
+is_valid_irods_collection = _make_predicate("irods_collection")
+is_valid_dropzone_token = _make_predicate("dropzone_token")
+is_valid_metadata_version_number = _make_predicate("metadata_version_number")
+is_valid_string_boolean = _make_predicate("string_boolean")
+is_valid_budget_number = _make_predicate("budget_number")
+is_valid_project_collection_action_name = _make_predicate("project_collection_action_name")
+is_valid_project_collections_action_avu = _make_predicate("project_collections_action_avu")
+
 
 def validate_full_path_safety(full_path):
     """
@@ -43,6 +156,73 @@ def allnamesequal(name):
     return all(n == name[0] for n in name[1:])
 
 
+def normalize_irods_path(path):
+    """
+    Resolve the ".", ".." and duplicate slashes of an iRODS path, with plain string operations.
+
+    The result is the same as posixpath.normpath: unlike os.path.abspath, the process working directory is never used,
+    so relative paths stay relative.
+
+    Parameters
+    ----------
+    path: str
+        The path to normalize, e.g: /nlmumc/projects/P000000001/./foo/../bar
+
+    Returns
+    -------
+    str
+        The normalized path, e.g: /nlmumc/projects/P000000001/bar
+    """
+    # Fast path: nothing to resolve
+    if "//" not in path and "/." not in path and path[-1:] != "/" and path[:1] == "/":
+        return path
+    if not path:
+        return "."
+    if path[:1] != "/":
+        initial_slashes = 0
+    elif path[:2] == "//" and path[:3] != "///":
+        # POSIX allows an implementation-defined meaning for exactly two leading slashes, keep them
+        initial_slashes = 2
+    else:
+        initial_slashes = 1
+    parts = []
+    for part in path.split("/"):
+        if part == "" or part == ".":
+            continue
+        if part != ".." or (not initial_slashes and not parts) or (parts and parts[-1] == ".."):
+            parts.append(part)
+        elif parts:
+            parts.pop()
+    return "/" * initial_slashes + "/".join(parts) or "."
+
+
+def _is_under(path, basedir):
+    """Check if the normalized path is basedir, or inside it, by comparing whole path components"""
+    if basedir[-1:] == "/" or "//" in basedir:
+        base_parts = basedir.split("/")
+        return path.split("/")[: len(base_parts)] == base_parts
+    return path == basedir or (path.startswith(basedir) and path[len(basedir)] == "/")
+
+
+def is_safe_path(basedir, path):
+    """
+    Check if the path stays inside basedir once normalized, without raising an exception, see validate_path_safety.
+
+    Parameters
+    ----------
+    basedir: str
+        The base path, e.g: /nlmumc/projects/P000000001
+    path: str
+        The path to the requested object, e.g: /nlmumc/projects/P000000001/instance.json
+
+    Returns
+    -------
+    bool
+        True if the path is absolute and inside basedir
+    """
+    return path[:1] == "/" and _is_under(normalize_irods_path(path), basedir)
+
+
 # https://security.openstack.org/guidelines/dg_using-file-paths.html
 # https://github.com/irods/python-irodsclient/blob/main/irods/path/__init__.py#L60
 def validate_path_safety(basedir, path):
@@ -64,15 +244,192 @@ def validate_path_safety(basedir, path):
     Raises
     -------
     ValidationError
-        Raises a ValidationError, if not a safe path.
+        Raises a ValidationError, if not a safe path (relative paths are never safe).
     """
-    match_path = os.path.abspath(path)
-    # if basedir == os.path.commonpath((basedir, match_path)): # NOT pyhton 2.7 compatible
-    if basedir == commonpath([basedir, match_path]):
+    if is_safe_path(basedir, path):
         return True
     raise exceptions.ValidationError("Path is not safe: {}".format(path))
 
 
+def validate_paths_safety(basedir, paths):
+    """
+    Validate many paths under the same basedir at once, see validate_path_safety.
+
+    Parameters
+    ----------
+    basedir: str
+        The base path, e.g: /nlmumc/projects/P000000001
+    paths: iterable|numpy.ndarray
+        The paths to the requested objects
+
+    Returns
+    -------
+    tuple(list|numpy.ndarray, list)
+        The boolean mask of the safe paths (a NumPy array if paths is one), and the list of (index, reason) of the
+        unsafe ones
+    """
+    return _check_many(
+        paths, lambda path: isinstance(path, str) and is_safe_path(basedir, path), "Path is not safe: {}"
+    )
+
+
+class PathContainmentChecker:
+    """
+    Incremental safety check of many paths against the same base directory, e.g: all the files of a dropzone tree.
+
+    Every directory prefix is resolved once and cached, as a flattened path trie: a path is checked by resolving its
+    parent directory from the cache (only the components never seen before are walked) and stepping to its last
+    component. The results are the same as validate_path_safety(basedir, path) for absolute paths, and as
+    validate_path_safety(basedir, posixpath.join(basedir, path)) for relative ones.
+    """
+
+    def __init__(self, basedir):
+        """
+        Parameters
+        ----------
+        basedir: str
+            The absolute base path, e.g: /nlmumc/projects/P000000001/C000000001
+        """
+        if basedir[:1] != "/":
+            raise exceptions.ValidationError("Base directory is not absolute: {}".format(basedir))
+        self.basedir = basedir
+        # With a trailing slash or empty components, containment can't be inherited from the parent directory
+        self._inherit_containment = basedir[-1:] != "/" and "//" not in basedir
+        # A file is basedir itself only if its directory normalizes to the parent of basedir and its name matches
+        self._base_parent, _, self._base_name = basedir.rpartition("/")
+        self._base_parent = self._base_parent or "/"
+        # Two leading slashes are kept by the normalization, so relative paths are joined to such a basedir
+        self._join_relative = basedir[:2] == "//" and basedir[:3] != "///"
+        # Raw directory -> (normalized directory, whether it's basedir or inside it). Absolute directories are keyed
+        # from the root ("" is "/"), relative ones from basedir ("" is basedir).
+        self._directories = {"": ("/", _is_under("/", basedir))}
+        normalized = normalize_irods_path(basedir)
+        self._relative_directories = {"": (normalized, _is_under(normalized, basedir))}
+
+    def _step(self, directory, name):
+        """Resolve one path component from a resolved directory"""
+        normalized, inside = directory
+        if name == "" or name == ".":
+            return directory
+        if name == "..":
+            parent = normalized.rpartition("/")[0] or "/"
+            return parent, _is_under(parent, self.basedir)
+        child = normalized + name if normalized == "/" else normalized + "/" + name
+        if not self._inherit_containment:
+            return child, _is_under(child, self.basedir)
+        # A child of a directory outside basedir can only be inside it by being basedir itself
+        return child, inside or child == self.basedir
+
+    def _resolve_directory(self, directory, directories):
+        resolved = directories.get(directory)
+        if resolved is not None:
+            return resolved
+        # Walk up to the nearest cached ancestor, then resolve and cache the new prefixes on the way down
+        pending = []
+        while resolved is None:
+            pending.append(directory)
+            directory = directory.rpartition("/")[0]
+            resolved = directories.get(directory)
+        for directory in reversed(pending):
+            resolved = directories[directory] = self._step(resolved, directory.rpartition("/")[2])
+        return resolved
+
+    def _split(self, path):
+        """Return the resolved directory of a path and its last component, or None and the path if not cacheable"""
+        if path[:1] == "/":
+            if path[:2] == "//" and path[:3] != "///":
+                # Two leading slashes are kept by the normalization, not worth caching
+                return None, path
+            directories = self._directories
+        elif self._join_relative:
+            return None, self.basedir + "/" + path
+        else:
+            directories = self._relative_directories
+        directory, _, name = path.rpartition("/")
+        resolved = directories.get(directory)
+        if resolved is None:
+            resolved = self._resolve_directory(directory, directories)
+        return resolved, name
+
+    def resolve(self, path):
+        """
+        Normalize a path, see normalize_irods_path.
+
+        Parameters
+        ----------
+        path: str
+            The absolute path, or the path relative to basedir
+
+        Returns
+        -------
+        tuple(str, bool)
+            The normalized absolute path, and whether it is basedir or inside it
+        """
+        resolved, name = self._split(path)
+        if resolved is None:
+            normalized = normalize_irods_path(name)
+            return normalized, _is_under(normalized, self.basedir)
+        return self._step(resolved, name)
+
+    def check(self, path):
+        """
+        Parameters
+        ----------
+        path: str
+            The absolute path, or the path relative to basedir
+
+        Returns
+        -------
+        bool
+            True if the path is safe, i.e. basedir or inside it once normalized
+        """
+        resolved, name = self._split(path)
+        if resolved is not None and self._inherit_containment and name != "." and name != ".." and name:
+            # Plain file name: no need to build its normalized path
+            return resolved[1] or (name == self._base_name and resolved[0] == self._base_parent)
+        return self.resolve(path)[1]
+
+    def validate(self, path):
+        """
+        Validate if the path provided is safe or not, see validate_path_safety.
+
+        Parameters
+        ----------
+        path: str
+            The absolute path, or the path relative to basedir
+
+        Returns
+        -------
+        bool
+            True, if the path is safe.
+
+        Raises
+        -------
+        ValidationError
+            Raises a ValidationError, if not a safe path.
+        """
+        if self.check(path):
+            return True
+        raise exceptions.ValidationError("Path is not safe: {}".format(path))
+
+    def check_many(self, paths):
+        """
+        Check many paths at once.
+
+        Parameters
+        ----------
+        paths: iterable|numpy.ndarray
+            The absolute paths, or the paths relative to basedir
+
+        Returns
+        -------
+        tuple(list|numpy.ndarray, list)
+            The boolean mask of the safe paths (a NumPy array if paths is one), and the list of (index, reason) of the
+            unsafe ones
+        """
+        return _check_many(paths, lambda path: isinstance(path, str) and self.check(path), "Path is not safe: {}")
+
+
 def validate_project_id(project_id):
     """
     Validate the project id, raise an exception if not valid.
@@ -92,9 +449,7 @@ def validate_project_id(project_id):
     ValidationError
         Raises a ValidationError, if not a valid project id.
     """
-    if isinstance(project_id, str) and re.search("^P[0-9]{9}$", project_id) is not None:
-        return True
-    raise exceptions.ValidationError("Invalid project id {}".format(project_id))
+    return _validate("project_id", project_id)
 
 
 def validate_project_path(project_path):
@@ -116,9 +471,7 @@ def validate_project_path(project_path):
     ValidationError
         Raises a ValidationError, if not a valid project path.
     """
-    if re.search("^/nlmumc/projects/P[0-9]{9}$", project_path) is not None:
-        return True
-    raise exceptions.ValidationError("Invalid project path {}".format(project_path))
+    return _validate("project_path", project_path)
 
 
 def validate_collection_id(collection_id):
@@ -140,9 +493,7 @@ def validate_collection_id(collection_id):
     ValidationError
         Raises a ValidationError, if not a valid collection id.
     """
-    if re.search("^C[0-9]{9}$", collection_id) is not None:
-        return True
-    raise exceptions.ValidationError("Invalid collection id {}".format(collection_id))
+    return _validate("collection_id", collection_id)
 
 
 def validate_project_collection_path(project_collection_path):
@@ -164,9 +515,7 @@ def validate_project_collection_path(project_collection_path):
     ValidationError
         Raises a ValidationError, if not a valid project collection path.
     """
-    if re.search("^/nlmumc/projects/P[0-9]{9}/C[0-9]{9}$", project_collection_path) is not None:
-        return True
-    raise exceptions.ValidationError("Invalid project collection path {}".format(project_collection_path))
+    return _validate("project_collection_path", project_collection_path)
 
 
 def validate_file_path(file_path):
@@ -188,9 +537,7 @@ def validate_file_path(file_path):
     ValidationError
         Raises a ValidationError, if not a valid file path.
     """
-    if re.search("^/nlmumc/projects/P[0-9]{9}/C[0-9]{9}/", file_path) is not None:
-        return True
-    raise exceptions.ValidationError("Invalid file path {}".format(file_path))
+    return _validate("file_path", file_path)
 
 
 def validate_dropzone_type(dropzone_type):
@@ -212,9 +559,7 @@ def validate_dropzone_type(dropzone_type):
     ValidationError
         Raises a ValidationError, if not a valid project path.
     """
-    if dropzone_type in ["mounted", "direct"]:
-        return True
-    raise exceptions.ValidationError("Invalid dropzone type {}".format(dropzone_type))
+    return _validate("dropzone_type", dropzone_type)
 
 
 def validate_irods_collection(path):
@@ -236,19 +581,7 @@ def validate_irods_collection(path):
     ValidationError
         Raises a ValidationError, if not valid.
     """
-    try:
-        validate_project_collection_path(path)
-        return True
-    except exceptions.ValidationError:
-        pass
-
-    try:
-        validate_project_path(path)
-        return True
-    except exceptions.ValidationError:
-        pass
-
-    raise exceptions.ValidationError("Invalid irods collection path {}".format(path))
+    return _validate("irods_collection", path)
 
 
 def validate_dropzone_token(token):
@@ -271,9 +604,7 @@ def validate_dropzone_token(token):
         Raises a ValidationError, if not valid.
 
     """
-    if re.search(r"^\w+-\w+$", token) is not None:
-        return True
-    raise exceptions.ValidationError("Invalid dropzone token{}".format(token))
+    return _validate("dropzone_token", token)
 
 
 def validate_metadata_version_number(version):
@@ -295,9 +626,7 @@ def validate_metadata_version_number(version):
     ValidationError
         Raises a ValidationError, if not valid.
     """
-    if isinstance(version, int) or (isinstance(version, str) and version.isdigit()):
-        return True
-    raise exceptions.ValidationError("Invalid version number {}".format(version))
+    return _validate("metadata_version_number", version)
 
 
 def validate_string_boolean(string_boolean):
@@ -319,10 +648,7 @@ def validate_string_boolean(string_boolean):
     ValidationError
         Raises a ValidationError, if not valid.
     """
-    if string_boolean not in ("true", "false"):
-        raise exceptions.ValidationError("Invalid boolean as string '{}'".format(string_boolean))
-
-    return True
+    return _validate("string_boolean", string_boolean)
 
 
 def validate_budget_number(budget_number):
@@ -347,18 +673,7 @@ def validate_budget_number(budget_number):
     ValidationError
         Raises a ValidationError if the budget number doesn't follow of the allowed format
     """
-    if (
-        re.fullmatch(r"^UM-\d{10}$", budget_number)
-        or re.fullmatch(r"^UM-\d{11}[A-Z]$", budget_number)
-        or re.fullmatch(r"^UM-[A-Z]/\d{11}[A-Z]\.\d{3}$", budget_number)
-    ):
-        return True
-    if re.fullmatch(r"^AZM-\d{6}$", budget_number):
-        return True
-    if re.fullmatch(r"^XXXXXXXXX$", budget_number):
-        return True
-
-    raise exceptions.ValidationError("Invalid budget number as string '{}'".format(budget_number))
+    return _validate("budget_number", budget_number)
 
 
 def validate_project_collection_action_name(action):
@@ -380,12 +695,7 @@ def validate_project_collection_action_name(action):
     ValidationError
         Raises a ValidationError if the action is not part of the Enum ProjectCollectionActions
     """
-    try:
-        ProjectCollectionActions[action].value
-    except KeyError:
-        raise exceptions.ValidationError("Invalid ProjectCollectionActions '{}'".format(action))
-
-    return True
+    return _validate("project_collection_action_name", action)
 
 
 def validate_project_collections_action_avu(attribute):
@@ -407,6 +717,174 @@ def validate_project_collections_action_avu(attribute):
     ValidationError
         Raises a ValidationError if the action is not part of the Enum ProjectCollectionActions
     """
-    if attribute in [actions.value for actions in ProjectCollectionActions]:
-        return True
-    raise exceptions.ValidationError("Invalid ProjectCollectionActions AVU '{}'".format(attribute))
+    return _validate("project_collections_action_avu", attribute)
+
+
+def _validate_many(name, values):
+    """
+    Check all the values in one pass, without raising.
+
+    Parameters
+    ----------
+    name: str
+        The name of the validation in VALIDATION_SPECS
+    values: iterable|numpy.ndarray
+        The values to validate
+
+    Returns
+    -------
+    tuple(list|numpy.ndarray, list)
+        The boolean mask of the valid values (a NumPy array if values is one), and the (index, reason) failures
+    """
+    is_valid, reason = VALIDATION_SPECS[name]
+    return _check_many(values, is_valid, reason)
+
+
+def _check_many(values, is_valid, reason):
+    is_array = np is not None and isinstance(values, np.ndarray)
+    if is_array:
+        values = values.tolist()
+    elif not isinstance(values, (list, tuple)):
+        values = list(values)
+    mask = [is_valid(value) for value in values]
+    failures = [(index, reason.format(values[index])) for index, valid in enumerate(mask) if not valid]
+    if is_array:
+        mask = np.array(mask, dtype=bool)
+    return mask, failures
+
+
+def validate_project_ids(project_ids):
+    """
+    Validate many project ids at once, see validate_project_id.
+
+    Parameters
+    ----------
+    project_ids: iterable|numpy.ndarray
+        The project ids, e.g: ["P000000001", "P000000002"]
+
+    Returns
+    -------
+    tuple(list|numpy.ndarray, list)
+        The boolean mask of the valid project ids (a NumPy array if project_ids is one), and the list of
+        (index, reason) of the invalid ones
+    """
+    return _validate_many("project_id", project_ids)
+
+
+def validate_project_paths(project_paths):
+    """
+    Validate many project paths at once, see validate_project_path.
+
+    Parameters
+    ----------
+    project_paths: iterable|numpy.ndarray
+        The project paths, e.g: ["/nlmumc/projects/P000000001"]
+
+    Returns
+    -------
+    tuple(list|numpy.ndarray, list)
+        The boolean mask of the valid project paths, and the list of (index, reason) of the invalid ones
+    """
+    return _validate_many("project_path", project_paths)
+
+
+def validate_collection_ids(collection_ids):
+    """
+    Validate many collection ids at once, see validate_collection_id.
+
+    Parameters
+    ----------
+    collection_ids: iterable|numpy.ndarray
+        The collection ids, e.g: ["C000000001", "C000000002"]
+
+    Returns
+    -------
+    tuple(list|numpy.ndarray, list)
+        The boolean mask of the valid collection ids, and the list of (index, reason) of the invalid ones
+    """
+    return _validate_many("collection_id", collection_ids)
+
+
+def validate_project_collection_paths(project_collection_paths):
+    """
+    Validate many project collection paths at once, see validate_project_collection_path.
+
+    Parameters
+    ----------
+    project_collection_paths: iterable|numpy.ndarray
+        The project collection paths, e.g: ["/nlmumc/projects/P000000001/C000000001"]
+
+    Returns
+    -------
+    tuple(list|numpy.ndarray, list)
+        The boolean mask of the valid project collection paths, and the list of (index, reason) of the invalid ones
+    """
+    return _validate_many("project_collection_path", project_collection_paths)
+
+
+def validate_file_paths(file_paths):
+    """
+    Validate many file paths at once, see validate_file_path.
+
+    Parameters
+    ----------
+    file_paths: iterable|numpy.ndarray
+        The file paths, e.g: ["/nlmumc/projects/P000000001/C000000001/schema.json"]
+
+    Returns
+    -------
+    tuple(list|numpy.ndarray, list)
+        The boolean mask of the valid file paths, and the list of (index, reason) of the invalid ones
+    """
+    return _validate_many("file_path", file_paths)
+
+
+def validate_irods_collections(paths):
+    """
+    Validate many iRODS collection paths at once, see validate_irods_collection.
+
+    Parameters
+    ----------
+    paths: iterable|numpy.ndarray
+        The absolute iRODS collection paths
+
+    Returns
+    -------
+    tuple(list|numpy.ndarray, list)
+        The boolean mask of the valid collection paths, and the list of (index, reason) of the invalid ones
+    """
+    return _validate_many("irods_collection", paths)
+
+
+def validate_dropzone_tokens(tokens):
+    """
+    Validate many dropzone tokens at once, see validate_dropzone_token.
+
+    Parameters
+    ----------
+    tokens: iterable|numpy.ndarray
+        The dropzone token values
+
+    Returns
+    -------
+    tuple(list|numpy.ndarray, list)
+        The boolean mask of the valid tokens, and the list of (index, reason) of the invalid ones
+    """
+    return _validate_many("dropzone_token", tokens)
+
+
+def validate_budget_numbers(budget_numbers):
+    """
+    Validate many budget numbers at once, see validate_budget_number.
+
+    Parameters
+    ----------
+    budget_numbers: iterable|numpy.ndarray
+        The budget numbers to validate
+
+    Returns
+    -------
+    tuple(list|numpy.ndarray, list)
+        The boolean mask of the valid budget numbers, and the list of (index, reason) of the invalid ones
+    """
+    return _validate_many("budget_number", budget_numbers)
@@ -20,4 +20,5 @@ setuptools.setup(
     ],
     python_requires=">=2.7",
     tests_requires=["pytest", "pytest-dotenv"],
+    extras_require={"numpy": ["numpy"]},
 )
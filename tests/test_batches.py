@@ -0,0 +1,82 @@
+from datetime import datetime
+
+import pytest
+
+from dhpythonirodsutils import parsers
+from dhpythonirodsutils.enums import AuditTailTopics
+
+np = pytest.importorskip("numpy")
+
+from dhpythonirodsutils.batches import AuditTrailBatch, MISSING_CODE  # noqa: E402
+
+AUDIT_LOG_LINES = [
+    "[2022-05-03 16:12:12][AUDIT_TRAIL][10043][CREATE_DROPZONE] - type: direct. User is internal: False",
+    "[2022-05-03 16:12:12] [INFO] rods - not an audit trail message",
+    "[2022-05-03 16:49:30][AUDIT_TRAIL][10043][DOWNLOAD_DATA] - downloaded é",
+    "[2022-05-03 16:53:21][AUDIT_TRAIL][jmelius][DOWNLOAD_DATA] - GET /P000000017/C000000001/ncit.owl HTTP/1.1",
+    "[2022-05-03 17:02:00][AUDIT_TRAIL][][CUSTOM_TOPIC] - ",
+    "[2022-05-04 09:00:00][AUDIT_TRAIL][10044][LOGIN] - logged in",
+]
+
+
+@pytest.fixture
+def batch():
+    return AuditTrailBatch.from_source(AUDIT_LOG_LINES)
+
+
+def test_audit_trail_batch_rows(batch):
+    expected = list(parsers.iter_audit_trail_messages(AUDIT_LOG_LINES))
+    assert len(batch) == len(expected)
+    assert [batch.row(index) for index in range(len(batch))] == expected
+    assert batch.time_stamps.dtype == np.dtype("datetime64[s]")
+    assert batch.topics[: len(AuditTailTopics)] == [topic.value for topic in AuditTailTopics]
+    assert batch.topics[batch.topic_codes[3]] == "CUSTOM_TOPIC"
+    assert batch.user_ids == ["10043", "10044"]
+    assert batch.user_id_codes.tolist() == [0, 0, MISSING_CODE, MISSING_CODE, 1]
+
+
+def test_audit_trail_batch_non_canonical_user_ids():
+    lines = [
+        "[2022-05-03 16:12:12][AUDIT_TRAIL][010043][LOGIN] - leading zero",
+        "[2022-05-03 16:12:13][AUDIT_TRAIL][\u0661\u0662][LOGIN] - arabic-indic digits",
+        "[2022-05-03 16:12:14][AUDIT_TRAIL][10043][LOGIN] - canonical",
+    ]
+    batch = AuditTrailBatch.from_source(lines)
+    assert [batch.row(index) for index in range(len(batch))] == list(parsers.iter_audit_trail_messages(lines))
+    assert batch.user_mask(10043).tolist() == [False, False, True]
+    assert batch.user_mask("010043").tolist() == [True, False, False]
+    assert not batch.user_mask(12).any()
+
+
+@pytest.mark.parametrize("parse_time_stamp", [True, "epoch"])
+def test_audit_trail_batch_from_parsed_time_stamps(parse_time_stamp):
+    records = parsers.iter_audit_trail_messages(AUDIT_LOG_LINES, parse_time_stamp=parse_time_stamp)
+    batch = AuditTrailBatch.from_records(records)
+    assert batch.time_stamps[0] == np.datetime64("2022-05-03T16:12:12")
+
+
+def test_audit_trail_batch_masks(batch):
+    assert batch.topic_mask(AuditTailTopics.DOWNLOAD_DATA).tolist() == [False, True, True, False, False]
+    assert batch.topic_mask("DOWNLOAD_DATA").tolist() == [False, True, True, False, False]
+    assert not batch.topic_mask(AuditTailTopics.SEARCH).any()
+    assert batch.user_mask(10043).tolist() == [True, True, False, False, False]
+    assert batch.time_mask("2022-05-03 16:49:30", datetime(2022, 5, 4)).tolist() == [False, True, True, True, False]
+    assert batch.time_mask().all()
+
+
+def test_audit_trail_batch_filter(batch):
+    subset = batch.filter(batch.topic_mask(AuditTailTopics.DOWNLOAD_DATA) | batch.user_mask(10044))
+    assert len(subset) == 3
+    assert [subset.event(index) for index in range(len(subset))] == [
+        "downloaded é",
+        "GET /P000000017/C000000001/ncit.owl HTTP/1.1",
+        "logged in",
+    ]
+    assert subset.row(1)["irods_user_name"] == "jmelius"
+
+
+def test_audit_trail_batch_histograms(batch):
+    assert batch.topic_histogram() == {"CREATE_DROPZONE": 1, "DOWNLOAD_DATA": 2, "LOGIN": 1, "CUSTOM_TOPIC": 1}
+    buckets, counts = batch.time_histogram("D")
+    assert buckets.tolist() == [np.datetime64("2022-05-03", "D").item(), np.datetime64("2022-05-04", "D").item()]
+    assert counts.tolist() == [4, 1]
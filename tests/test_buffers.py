@@ -0,0 +1,127 @@
+import io
+from datetime import datetime
+
+import pytest
+
+from dhpythonirodsutils import buffers, loggers
+from dhpythonirodsutils.enums import AuditTailTopics
+
+START = int(datetime(2023, 1, 12, 9, 40, 16).timestamp())
+
+
+def make_buffer(capacity, count):
+    ring_buffer = buffers.AuditTrailRingBuffer(capacity)
+    topics = [AuditTailTopics.LOGIN, "view_metadata", AuditTailTopics.SEARCH]
+    for number in range(count):
+        ring_buffer.append(10000 + number % 2, topics[number % 3], "event {}".format(number), START + number)
+    return ring_buffer
+
+
+def test_ring_buffer_overwrites_oldest():
+    ring_buffer = make_buffer(5, 12)
+    assert len(ring_buffer) == 5
+    assert [row["event"] for row in ring_buffer.query()] == ["event {}".format(number) for number in range(11, 6, -1)]
+
+
+@pytest.mark.parametrize(
+    "criteria, expected",
+    [
+        ({}, list(range(19, 9, -1))),
+        ({"user_id": 10001}, [19, 17, 15, 13, 11]),
+        ({"user_id": "10000", "topic": AuditTailTopics.LOGIN}, [18, 12]),
+        ({"topic": "VIEW_METADATA"}, [19, 16, 13, 10]),
+        ({"topic": AuditTailTopics.INGEST}, []),
+        ({"topic": "unknown"}, []),
+        ({"start": START + 15}, [19, 18, 17, 16, 15]),
+        ({"start": datetime.fromtimestamp(START + 15), "end": datetime.fromtimestamp(START + 17)}, [16, 15]),
+        ({"end": START + 12}, [11, 10]),
+        ({"limit": 3}, [19, 18, 17]),
+        ({"user_id": 10000, "limit": 2}, [18, 16]),
+    ],
+)
+def test_ring_buffer_query(criteria, expected):
+    ring_buffer = make_buffer(10, 20)
+    assert [int(row["event"].split()[1]) for row in ring_buffer.query(**criteria)] == expected
+
+
+def _brute_force(events, user_id=None, start=None, end=None):
+    return [
+        event
+        for time_stamp, event_user_id, event in reversed(events)
+        if (user_id is None or event_user_id == user_id)
+        and (start is None or time_stamp >= start)
+        and (end is None or time_stamp < end)
+    ]
+
+
+@pytest.mark.parametrize("out_of_order", [False, True])
+def test_ring_buffer_query_matches_scan(out_of_order):
+    ring_buffer = buffers.AuditTrailRingBuffer(7)
+    events = []
+    for number in range(30):
+        time_stamp = START + number // 2
+        if out_of_order and number in (12, 25):
+            time_stamp -= 5
+        ring_buffer.append(10000 + number % 3, "login", "event {}".format(number), time_stamp)
+        events = (events + [(time_stamp, 10000 + number % 3, "event {}".format(number))])[-7:]
+        for start, end in [(None, None), (START + 8, None), (None, START + 10), (START + 7, START + 9), (START + 9, 0)]:
+            for user_id in (None, 10001):
+                result = [row["event"] for row in ring_buffer.query(user_id=user_id, start=start, end=end)]
+                assert result == _brute_force(events, user_id, start, end), (number, start, end, user_id)
+
+
+def test_ring_buffer_row():
+    ring_buffer = make_buffer(10, 1)
+    ring_buffer.append(None, "login", "anonymous", START)
+    ring_buffer.append(None, "login", "named", START, user_name="jmelius")
+    assert ring_buffer.query() == [
+        {
+            "time_stamp": datetime.fromtimestamp(START),
+            "irods_user_id": None,
+            "irods_user_name": "jmelius",
+            "topic": "LOGIN",
+            "event": "named",
+        },
+        {
+            "time_stamp": datetime.fromtimestamp(START),
+            "irods_user_id": "",
+            "irods_user_name": None,
+            "topic": "LOGIN",
+            "event": "anonymous",
+        },
+        {
+            "time_stamp": datetime.fromtimestamp(START),
+            "irods_user_id": "10000",
+            "irods_user_name": None,
+            "topic": "LOGIN",
+            "event": "event 0",
+        },
+    ]
+
+
+def test_ring_buffer_append_line():
+    ring_buffer = buffers.AuditTrailRingBuffer(4)
+    ring_buffer.append_line("[2023-01-12 09:40:16][AUDIT_TRAIL][10043][DOWNLOAD_DATA] - file.txt")
+    ring_buffer.append_line("[2023-01-12 09:40:17][AUDIT_TRAIL][jmelius][LOGIN] - ok")
+    assert [(row["irods_user_id"], row["irods_user_name"], row["topic"]) for row in ring_buffer.query()] == [
+        (None, "jmelius", "LOGIN"),
+        ("10043", None, "DOWNLOAD_DATA"),
+    ]
+    assert ring_buffer.query(user_id=10043)[0]["time_stamp"] == datetime(2023, 1, 12, 9, 40, 16)
+    with pytest.raises(ValueError):
+        ring_buffer.append_line("not an audit trail")
+
+
+def test_ring_buffer_invalid_capacity():
+    with pytest.raises(ValueError):
+        buffers.AuditTrailRingBuffer(0)
+
+
+def test_ring_buffer_emitter():
+    ring_buffer = buffers.AuditTrailRingBuffer(10, now=lambda: START)
+    stream = io.StringIO()
+    with loggers.AuditTrailEmitter(stream, ring_buffer=ring_buffer) as emitter:
+        emitter.emit(10043, AuditTailTopics.SEARCH, "query")
+    assert ring_buffer.query(topic="search")[0]["event"] == "query"
+    # The same topic is written to the log and kept in memory
+    assert "[AUDIT_TRAIL][10043][SEARCH] - query" in stream.getvalue()
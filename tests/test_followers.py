@@ -0,0 +1,66 @@
+import os
+
+from dhpythonirodsutils import followers
+
+LINE = "[2022-05-03 16:12:{:02d}][AUDIT_TRAIL][10043][DOWNLOAD_DATA] - event {}\n"
+
+
+def _append(path, text):
+    with open(path, "a", encoding="utf-8") as log_file:
+        log_file.write(text)
+
+
+def _events(output):
+    return [item["event"] for item in output]
+
+
+def test_follower_reads_appended_lines(tmp_path):
+    log_path = tmp_path / "audit.log"
+    _append(log_path, LINE.format(1, 1) + "[2022-05-03 16:12:12] [INFO] rods - other\n")
+    follower = followers.AuditLogFollower(log_path)
+    assert _events(follower.poll()) == ["event 1"]
+    assert follower.poll() == []
+
+    _append(log_path, LINE.format(2, 2) + LINE.format(3, 3)[:30])
+    assert _events(follower.poll()) == ["event 2"]
+    _append(log_path, LINE.format(3, 3)[30:])
+    assert _events(follower.poll()) == ["event 3"]
+    assert follower.offset == os.path.getsize(log_path)
+
+
+def test_follower_checkpoint(tmp_path):
+    log_path = tmp_path / "audit.log"
+    checkpoint_path = tmp_path / "checkpoint.json"
+    _append(log_path, LINE.format(1, 1) + LINE.format(2, 2)[:20])
+    assert _events(followers.AuditLogFollower(log_path, checkpoint_path).poll()) == ["event 1"]
+
+    _append(log_path, LINE.format(2, 2)[20:])
+    follower = followers.AuditLogFollower(log_path, checkpoint_path, as_record=True)
+    assert follower.offset == len(LINE.format(1, 1)) + 20
+    assert follower.partial_line == LINE.format(2, 2)[:20].encode("utf-8")
+    assert _events(follower.poll()) == ["event 2"]
+
+
+def test_follower_truncation(tmp_path):
+    log_path = tmp_path / "audit.log"
+    _append(log_path, LINE.format(1, 1) + LINE.format(2, 2))
+    follower = followers.AuditLogFollower(log_path)
+    assert len(follower.poll()) == 2
+
+    log_path.write_text(LINE.format(3, 3), encoding="utf-8")
+    assert _events(follower.poll()) == ["event 3"]
+
+
+def test_follower_rotation(tmp_path):
+    log_path = tmp_path / "audit.log"
+    checkpoint_path = tmp_path / "checkpoint.json"
+    _append(log_path, LINE.format(1, 1))
+    assert len(followers.AuditLogFollower(log_path, checkpoint_path).poll()) == 1
+
+    _append(log_path, LINE.format(2, 2) + LINE.format(3, 3).rstrip("\n"))
+    os.rename(log_path, str(log_path) + followers.ROTATED_SUFFIX)
+    _append(log_path, LINE.format(4, 4))
+    follower = followers.AuditLogFollower(log_path, checkpoint_path)
+    assert _events(follower.poll()) == ["event 2", "event 3", "event 4"]
+    assert follower.inode == os.stat(log_path).st_ino
+    assert follower.poll() == []
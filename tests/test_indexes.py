@@ -0,0 +1,159 @@
+import os
+import struct
+from datetime import datetime
+
+import pytest
+
+from dhpythonirodsutils import indexes, parsers
+from dhpythonirodsutils.enums import AuditTailTopics
+
+TOPICS = ["DOWNLOAD_DATA", "LOGIN", "SEARCH", "CREATE_DROPZONE"]
+USERS = ["10043", "10044", "jmelius", ""]
+
+
+def _log_lines(count, first=0):
+    lines = []
+    for number in range(first, first + count):
+        lines.append(
+            "[2022-05-03 {:02d}:{:02d}:{:02d}][AUDIT_TRAIL][{}][{}] - event {}\n".format(
+                number // 3600 % 24,
+                number // 60 % 60,
+                number % 60,
+                USERS[number // 70 % 4],
+                TOPICS[number // 100 % 3],
+                number,
+            )
+        )
+        if number % 5 == 0:
+            lines.append("[2022-05-03 16:12:12] [INFO] rods - not an audit trail message\n")
+    return lines
+
+
+def _brute_force(log_path, topic=None, user=None, start=None, end=None):
+    result = []
+    for output in parsers.iter_audit_trail_messages(log_path):
+        user_key = output["irods_user_name"] if output["irods_user_name"] is not None else output["irods_user_id"]
+        time_stamp = parsers.decode_time_stamp(output["time_stamp"])
+        if topic is not None and output["topic"] != topic:
+            continue
+        if user is not None and user_key != user:
+            continue
+        if start is not None and time_stamp < start:
+            continue
+        if end is not None and time_stamp >= end:
+            continue
+        result.append(output)
+    return result
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = tmp_path / "audit.log"
+    path.write_text("".join(_log_lines(2000)), encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize(
+    "topic, user, start, end",
+    [
+        (None, None, None, None),
+        ("LOGIN", None, None, None),
+        (AuditTailTopics.DOWNLOAD_DATA, "jmelius", None, None),
+        (None, "10043", datetime(2022, 5, 3, 0, 10), datetime(2022, 5, 3, 0, 20)),
+        (None, None, datetime(2022, 5, 3, 0, 30), None),
+        ("SEARCH", "", None, "2022-05-03 00:05:00"),
+        ("UNKNOWN", None, None, None),
+    ],
+)
+def test_query_audit_log(log_path, topic, user, start, end):
+    index = indexes.AuditLogIndex.open(log_path, block_size=1024)
+    expected_topic = topic.value if isinstance(topic, AuditTailTopics) else topic
+    expected_end = parsers.decode_time_stamp(end) if isinstance(end, str) else end
+    expected = _brute_force(log_path, expected_topic, user, start, expected_end)
+    assert list(index.query(topic, user, start, end)) == expected
+    if topic is not None or user is not None or start is not None:
+        assert len(index.candidate_blocks(topic, user, start, end)) < len(index.block_starts)
+
+
+def test_audit_log_index_save_and_load(log_path):
+    index = indexes.AuditLogIndex.open(log_path, block_size=1024)
+    assert os.path.exists(str(log_path) + indexes.INDEX_SUFFIX)
+    loaded = indexes.AuditLogIndex(log_path)
+    loaded.load()
+    assert loaded.block_size == 1024
+    assert loaded.indexed_size == os.path.getsize(log_path)
+    assert loaded.block_starts == index.block_starts
+    assert loaded.block_max_time_stamps == index.block_max_time_stamps
+    assert loaded.topic_postings == index.topic_postings
+    assert loaded.user_postings == index.user_postings
+    assert list(indexes.query_audit_log(log_path, topic="LOGIN")) == _brute_force(log_path, "LOGIN")
+
+
+def test_audit_log_index_incremental_update(log_path):
+    index = indexes.AuditLogIndex.open(log_path, block_size=1024)
+    block_count = len(index.block_starts)
+    first_blocks = index.block_starts[:]
+    assert not index.update()
+
+    with open(log_path, "a", encoding="utf-8") as log_file:
+        log_file.writelines(_log_lines(500, first=2000))
+        log_file.write("[2022-05-03 01:00:00][AUDIT_TRAIL][10043][LOGIN] - partial")
+    index = indexes.AuditLogIndex.open(log_path)
+    assert index.block_starts[:block_count] == first_blocks
+    assert len(index.block_starts) > block_count
+    assert index.indexed_size < os.path.getsize(log_path)
+    assert list(index.query(user="10043")) == _brute_force(log_path, user="10043")[:-1]
+
+    with open(log_path, "a", encoding="utf-8") as log_file:
+        log_file.write("\n")
+    assert list(indexes.query_audit_log(log_path, user="10043")) == _brute_force(log_path, user="10043")
+
+
+def test_audit_log_index_rebuilds_replaced_log(log_path):
+    indexes.AuditLogIndex.open(log_path, block_size=1024)
+    log_path.write_text("".join(_log_lines(10, first=100)), encoding="utf-8")
+    index = indexes.AuditLogIndex.open(log_path)
+    assert index.indexed_size == os.path.getsize(log_path)
+    assert list(index.query()) == _brute_force(log_path)
+
+
+def test_audit_log_index_invalid_file(log_path):
+    index_path = log_path.parent / "audit.log.idx"
+    index_path.write_bytes(b"not an index")
+    with pytest.raises(ValueError):
+        indexes.AuditLogIndex(log_path).load()
+
+
+def _bump_version(data):
+    return data[:4] + struct.pack("<H", indexes._VERSION + 1) + data[6:]
+
+
+@pytest.mark.parametrize(
+    "corrupt", [lambda data: b"garbage", lambda data: data[:-3], lambda data: data[:50], _bump_version]
+)
+def test_audit_log_index_rebuilds_invalid_file(log_path, corrupt):
+    index_path = log_path.parent / "audit.log.idx"
+    expected = indexes.AuditLogIndex.open(log_path, block_size=1024)
+    index_path.write_bytes(corrupt(index_path.read_bytes()))
+    index = indexes.AuditLogIndex.open(log_path, block_size=1024)
+    assert index.block_starts == expected.block_starts
+    assert index.topic_postings == expected.topic_postings
+    assert list(indexes.query_audit_log(log_path, topic="LOGIN")) == _brute_force(log_path, "LOGIN")
+    # The sidecar file was written again
+    loaded = indexes.AuditLogIndex(log_path)
+    loaded.load()
+    assert loaded.user_postings == expected.user_postings
+
+
+def test_audit_log_index_rewritten_for_truncated_log(log_path):
+    index_path = log_path.parent / "audit.log.idx"
+    indexes.AuditLogIndex.open(log_path)
+    log_path.write_bytes(b"")
+    index = indexes.AuditLogIndex.open(log_path)
+    assert index.indexed_size == 0
+    assert not index.block_starts
+    loaded = indexes.AuditLogIndex(log_path)
+    loaded.load()
+    assert loaded.indexed_size == 0
+    assert not loaded.update()
+    assert index_path.exists()
@@ -1,8 +1,15 @@
+import datetime
+import io
+import json
+import logging
 import re
+import sys
+import threading
 
 import pytest
 
-from dhpythonirodsutils import loggers
+from dhpythonirodsutils import loggers, parsers
+from dhpythonirodsutils.enums import AuditTailTopics
 from dhpythonirodsutils.parsers import AUDIT_TRAIL_REGEX
 
 MESSAGE_REGEX = (
@@ -73,3 +80,285 @@ def test_format_audit_trail_message(user_id, topic, event, expected_result):
     assert (str(user_id) == re_match.group("irods_user_id")) is expected_result
     assert topic.upper() == re_match.group("topic")
     assert event == re_match.group("event")
+
+
+@pytest.mark.parametrize("topic", [AuditTailTopics.LOGIN, "LOGIN", "login"])
+def test_format_topic(topic):
+    assert loggers.format_topic(topic) == "LOGIN"
+
+
+class BlockingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.unblocked = threading.Event()
+
+    def write(self, text):
+        self.unblocked.wait()
+        return super().write(text)
+
+
+def test_audit_trail_emitter_stream():
+    stream = io.StringIO()
+    emitter = loggers.AuditTrailEmitter(stream, batch_size=7, flush_interval=0.01)
+    for number in range(100):
+        assert emitter.emit(number, "download_data", "event {}".format(number))
+    emitter.flush()
+    lines = stream.getvalue().splitlines()
+    assert [parsers.parse_audit_trail_message(line)["event"] for line in lines] == [
+        "event {}".format(number) for number in range(100)
+    ]
+    emitter.close()
+    assert not stream.closed
+    with pytest.raises(ValueError):
+        emitter.emit(1, "login", "after close")
+
+
+def test_audit_trail_emitter_file(tmp_path):
+    log_path = tmp_path / "audit.log"
+    with loggers.AuditTrailEmitter(log_path, flush_interval=10) as emitter:
+        emitter.emit(10043, "login", "first")
+        emitter.emit(10043, "login", "second")
+    assert [output["event"] for output in parsers.iter_audit_trail_messages(log_path)] == ["first", "second"]
+
+
+@pytest.mark.parametrize("overflow", [loggers.OVERFLOW_DROP, loggers.OVERFLOW_COUNT])
+def test_audit_trail_emitter_overflow(overflow):
+    stream = BlockingStream()
+    emitter = loggers.AuditTrailEmitter(stream, max_queue_size=2, batch_size=1, flush_interval=0, overflow=overflow)
+    results = [emitter.emit(10043, "login", str(number)) for number in range(10)]
+    assert not all(results)
+    assert emitter.dropped == results.count(False)
+    stream.unblocked.set()
+    emitter.close()
+    lines = stream.getvalue().splitlines()
+    audit_lines = [line for line in lines if "[AUDIT_TRAIL]" in line]
+    assert len(audit_lines) == results.count(True)
+    warnings = [line for line in lines if "[WARNING]" in line]
+    if overflow == loggers.OVERFLOW_COUNT:
+        assert warnings and warnings[0].endswith("{} audit trail messages dropped".format(emitter.dropped))
+    else:
+        assert not warnings
+
+
+class BrokenStream(io.StringIO):
+    def write(self, text):
+        raise RuntimeError("broken stream")
+
+
+@pytest.mark.parametrize("overflow", [loggers.OVERFLOW_BLOCK, loggers.OVERFLOW_DROP])
+def test_audit_trail_emitter_write_error(overflow):
+    emitter = loggers.AuditTrailEmitter(BrokenStream(), max_queue_size=2, batch_size=1, overflow=overflow)
+    for number in range(10):
+        emitter.emit(10043, "login", str(number))
+    emitter.flush()
+    assert isinstance(emitter.last_error, RuntimeError)
+    emitter.close()
+
+
+def test_audit_trail_emitter_binary_stream():
+    emitter = loggers.AuditTrailEmitter(io.BytesIO(), flush_interval=0)
+    emitter.emit(10043, "login", "event")
+    emitter.flush()
+    assert isinstance(emitter.last_error, TypeError)
+    emitter.close()
+
+
+def test_audit_trail_emitter_line_type():
+    stream = io.StringIO()
+    with loggers.AuditTrailEmitter(stream) as emitter:
+        with pytest.raises(TypeError):
+            emitter.emit_line(123)
+        emitter.emit_line("line")
+    assert stream.getvalue() == "line\n"
+
+
+def test_audit_trail_emitter_invalid_overflow():
+    with pytest.raises(ValueError):
+        loggers.AuditTrailEmitter(io.StringIO(), overflow="explode")
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.value = now
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def test_time_stamp_clock():
+    now = datetime.datetime(2023, 1, 12, 9, 40, 16).timestamp()
+    fake_clock = FakeClock(now + 0.25)
+    rendered = []
+
+    def render_second(second):
+        rendered.append(second)
+        return datetime.datetime.fromtimestamp(second).strftime(loggers.TIME_STAMP_FORMAT)
+
+    clock = loggers.TimeStampClock(fake_clock, render_second)
+    assert clock.time_stamp() == "2023-01-12 09:40:16"
+    fake_clock.value = now + 0.75
+    assert clock.time_stamp() == "2023-01-12 09:40:16"
+    assert len(rendered) == 1
+    fake_clock.value = now + 1
+    assert clock.time_stamp() == "2023-01-12 09:40:17"
+    assert len(rendered) == 2
+
+
+def test_format_messages_with_clock():
+    clock = loggers.TimeStampClock(lambda: datetime.datetime(2023, 1, 12, 9, 40, 16, 500).timestamp())
+    assert loggers.format_log_message("info", "user1", "message", clock) == (
+        "[2023-01-12 09:40:16] [INFO] user1 - message"
+    )
+    assert loggers.format_audit_trail_message(10043, "login", "event", clock=clock) == (
+        "[2023-01-12 09:40:16][AUDIT_TRAIL][10043][LOGIN] - event"
+    )
+
+
+def test_default_clock_matches_now():
+    before = datetime.datetime.now().replace(microsecond=0)
+    time_stamp = datetime.datetime.strptime(loggers.DEFAULT_CLOCK.time_stamp(), "%Y-%m-%d %H:%M:%S")
+    assert before <= time_stamp <= datetime.datetime.now()
+
+
+FIXED_CLOCK = loggers.TimeStampClock(lambda: datetime.datetime(2023, 1, 12, 9, 40, 16).timestamp())
+
+
+@pytest.mark.parametrize(
+    "user_id, topic, event",
+    [
+        (10043, "login", "User logged in"),
+        (10043, AuditTailTopics.DOWNLOAD_DATA, "Download requested"),
+        ("10043", "Login", "non-int user id"),
+        (None, AuditTailTopics.LOGIN, "no user id"),
+    ],
+)
+def test_audit_trail_logger(user_id, topic, event):
+    logger = loggers.AuditTrailLogger(user_id, topic, clock=FIXED_CLOCK)
+    expected = loggers.format_audit_trail_message(user_id, topic, event, clock=FIXED_CLOCK)
+    assert logger.format(event) == expected
+    assert logger.format_many([event, event]) == [expected, expected]
+    assert re.match(AUDIT_TRAIL_REGEX, logger.format(event))
+
+
+@pytest.mark.parametrize("structured", [False, True])
+def test_audit_trail_logger_non_str_event(structured):
+    logger = loggers.AuditTrailLogger(10043, "login", clock=FIXED_CLOCK, structured=structured)
+    format_function = loggers.format_json_audit_trail_message if structured else loggers.format_audit_trail_message
+    expected = format_function(10043, "login", 42, FIXED_CLOCK)
+    assert logger.format(42) == expected
+    assert logger.format_many([42, None]) == [expected, format_function(10043, "login", None, FIXED_CLOCK)]
+
+
+def test_audit_trail_logger_prefix_cache_size(monkeypatch):
+    monkeypatch.setattr(loggers, "PREFIX_CACHE_SIZE", 4)
+    logger = loggers.AuditTrailLogger(10043, "login", clock=FIXED_CLOCK)
+    for number in range(10):
+        assert logger.format("event", "topic_{}".format(number)).endswith("[TOPIC_{}] - event".format(number))
+    assert len(logger._prefixes) <= 4
+    assert logger.format("event") == "[2023-01-12 09:40:16][AUDIT_TRAIL][10043][LOGIN] - event"
+
+
+def test_audit_trail_logger_topic_per_call():
+    logger = loggers.AuditTrailLogger(10043, clock=FIXED_CLOCK)
+    assert logger.format("event", AuditTailTopics.SEARCH) == "[2023-01-12 09:40:16][AUDIT_TRAIL][10043][SEARCH] - event"
+    assert logger.format_many(["a"], "login") == ["[2023-01-12 09:40:16][AUDIT_TRAIL][10043][LOGIN] - a"]
+    with pytest.raises(ValueError):
+        logger.format("event")
+    with pytest.raises(ValueError):
+        logger.format_many(["event"])
+
+
+@pytest.mark.parametrize("event", ["event", 'quoted "event" \\ %s', "ünïcode\n\ttab", ""])
+def test_format_json_messages(event):
+    log = loggers.format_json_log_message("info", "user1", event, FIXED_CLOCK)
+    assert json.loads(log) == {
+        "time_stamp": "2023-01-12 09:40:16",
+        "severity": "INFO",
+        "user": "user1",
+        "message": event,
+    }
+    assert "\n" not in log
+    log = loggers.format_json_audit_trail_message(10043, AuditTailTopics.LOGIN, event, FIXED_CLOCK)
+    assert json.loads(log) == {
+        "time_stamp": "2023-01-12 09:40:16",
+        "severity": "AUDIT_TRAIL",
+        "irods_user_id": "10043",
+        "topic": "LOGIN",
+        "event": event,
+    }
+    logger = loggers.AuditTrailLogger(10043, "login", clock=FIXED_CLOCK, structured=True)
+    assert logger.format(event) == log
+    assert logger.format_many([event]) == [log]
+
+
+def test_format_json_audit_trail_message_without_user_id():
+    log = loggers.format_json_audit_trail_message("10043", 'to"pic', "event", FIXED_CLOCK)
+    assert json.loads(log)["irods_user_id"] == ""
+    assert json.loads(log)["topic"] == 'TO"PIC'
+
+
+def make_record(message, **attributes):
+    record = logging.LogRecord("audit", logging.WARNING, __file__, 1, message, None, None)
+    record.created = datetime.datetime(2023, 1, 12, 9, 40, 16, 900).timestamp()
+    record.__dict__.update(attributes)
+    return record
+
+
+def test_log_message_formatter():
+    formatter = loggers.LogMessageFormatter(default_user="service")
+    assert formatter.format(make_record("careful", user="jmelius")) == (
+        "[2023-01-12 09:40:16] [WARNING] jmelius - careful"
+    )
+    log = formatter.format(make_record("no user"))
+    assert log == "[2023-01-12 09:40:16] [WARNING] service - no user"
+    assert parsers.parse_log_message(log)["user"] == "service"
+
+
+@pytest.mark.parametrize(
+    "attributes, expected",
+    [
+        (
+            {"user_id": 10043, "topic": AuditTailTopics.LOGIN},
+            "[2023-01-12 09:40:16][AUDIT_TRAIL][10043][LOGIN] - event",
+        ),
+        ({"user_id": "10043", "topic": "login"}, "[2023-01-12 09:40:16][AUDIT_TRAIL][][LOGIN] - event"),
+        ({}, "[2023-01-12 09:40:16][AUDIT_TRAIL][][SEARCH] - event"),
+    ],
+)
+def test_audit_trail_formatter(attributes, expected):
+    formatter = loggers.AuditTrailFormatter(default_topic=AuditTailTopics.SEARCH)
+    assert formatter.format(make_record("event", **attributes)) == expected
+    assert re.match(AUDIT_TRAIL_REGEX, expected)
+
+
+def test_formatter_exception():
+    formatter = loggers.LogMessageFormatter()
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        record = make_record("failed", user="rods", exc_info=sys.exc_info())
+    lines = formatter.format(record).split("\n")
+    assert lines[0] == "[2023-01-12 09:40:16] [WARNING] rods - failed"
+    assert lines[-1] == "RuntimeError: boom"
+
+
+def test_setup_queue_logging():
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(loggers.AuditTrailFormatter())
+    logger = logging.getLogger("test_setup_queue_logging")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener = loggers.setup_queue_logging(logger.name, [handler])
+    try:
+        for number in range(50):
+            logger.info("event %d", number, extra={"user_id": 10043, "topic": AuditTailTopics.DOWNLOAD_DATA})
+    finally:
+        listener.stop()
+        for queue_handler in logger.handlers[:]:
+            logger.removeHandler(queue_handler)
+    outputs = list(parsers.iter_audit_trail_messages(stream.getvalue().splitlines()))
+    assert [output["event"] for output in outputs] == ["event {}".format(number) for number in range(50)]
+    assert {output["topic"] for output in outputs} == {"DOWNLOAD_DATA"}
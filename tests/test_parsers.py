@@ -1,6 +1,17 @@
+import bz2
+import gzip
+import io
+import json
+import lzma
+import pickle
+import random
+import threading
+from datetime import datetime
+
 import pytest
 
-from dhpythonirodsutils import parsers
+from dhpythonirodsutils import loggers, parsers
+from dhpythonirodsutils.enums import AuditTailTopics
 
 
 @pytest.mark.parametrize(
@@ -26,3 +37,566 @@ def test_parse_audit_trail_message(log, expected_result):
     except ValueError:
         result = False
     assert result is expected_result
+
+
+AUDIT_LOG_LINES = [
+    "[2022-05-03 16:12:12][AUDIT_TRAIL][10043][CREATE_DROPZONE] - type: direct. User is internal: False\n",
+    "[2022-05-03 16:12:12] [INFO] rods - not an audit trail message\n",
+    "[2022-05-03 16:12:13][AUDIT_TRAIL][][CREATE_DROPZONE]- False\n",
+    "\n",
+    "[2022-05-03 16:53:21][AUDIT_TRAIL][jmelius][DOWNLOAD_DATA] - GET /P000000017/C000000001/ncit.owl HTTP/1.1\r\n",
+    "[2022-05-03 16:53:22][AUDIT_TRAIL][10043][LOGIN] - bare\rcarriage return\n",
+    "[2022-05-03 16:53:22][AUDIT_TRAIL][10043][LOGIN] - last line without newline",
+]
+
+
+def _expected_audit_logs(parse_time_stamp=False):
+    expected = []
+    for line in AUDIT_LOG_LINES:
+        try:
+            expected.append(parsers.parse_audit_trail_message(line.rstrip("\r\n"), parse_time_stamp))
+        except ValueError:
+            pass
+    return expected
+
+
+@pytest.mark.parametrize("parse_time_stamp", [False, True])
+def test_iter_audit_trail_messages_path(tmp_path, parse_time_stamp):
+    log_path = tmp_path / "audit.log"
+    log_path.write_text("".join(AUDIT_LOG_LINES), encoding="utf-8")
+    result = list(parsers.iter_audit_trail_messages(log_path, parse_time_stamp=parse_time_stamp, chunk_size=64))
+    assert result == _expected_audit_logs(parse_time_stamp)
+    assert len(result) == 4
+    assert result[1]["irods_user_name"] == "jmelius"
+    assert result[1]["event"] == "GET /P000000017/C000000001/ncit.owl HTTP/1.1"
+    assert result[2]["event"] == "bare\rcarriage return"
+
+
+def test_iter_audit_trail_messages_file_objects():
+    text = "".join(AUDIT_LOG_LINES)
+    assert list(parsers.iter_audit_trail_messages(io.StringIO(text))) == _expected_audit_logs()
+    binary_file = io.BytesIO(text.encode("utf-8"))
+    assert list(parsers.iter_audit_trail_messages(binary_file)) == _expected_audit_logs()
+    assert not binary_file.closed
+
+
+def test_iter_audit_trail_messages_iterable():
+    result = parsers.iter_audit_trail_messages(line for line in AUDIT_LOG_LINES)
+    assert list(result) == _expected_audit_logs()
+
+
+def test_split_file_ranges(tmp_path):
+    log_path = tmp_path / "audit.log"
+    content = "".join(AUDIT_LOG_LINES).encode("utf-8")
+    log_path.write_bytes(content)
+    ranges = list(parsers.split_file_ranges(log_path, 50))
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == len(content)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+        assert content[end - 1 : end] == b"\n"
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_parse_audit_trail_file_parallel(tmp_path, ordered):
+    log_path = tmp_path / "audit.log"
+    log_path.write_text("".join(AUDIT_LOG_LINES * 20), encoding="utf-8")
+    expected = list(parsers.iter_audit_trail_messages(log_path, parse_time_stamp=True))
+    result = list(
+        parsers.parse_audit_trail_file_parallel(
+            log_path, parse_time_stamp=True, max_workers=2, chunk_size=200, ordered=ordered
+        )
+    )
+    if ordered:
+        assert result == expected
+    else:
+        assert sorted(result, key=repr) == sorted(expected, key=repr)
+
+
+FUZZ_FRAGMENTS = [
+    "[",
+    "]",
+    "] - ",
+    "]\t-\t",
+    " - ",
+    "-",
+    " ",
+    "\t",
+    "\r",
+    "\n",
+    " ",
+    " ",
+    "_",
+    "@",
+    "a",
+    "Z",
+    "1",
+    "٣",
+    "²",
+    "é",
+    "[AUDIT_TRAIL]",
+    "DOWNLOAD_DATA",
+]
+
+
+def _fuzz_audit_trail_lines(count, seed=20221017):
+    rng = random.Random(seed)
+    time_stamps = ["2022-05-03 16:12:12", "2022-05-03\t16:12:12", "2022-05-0٣ 16:12:12", "2022-05-0² 16:12:12"]
+    users = ["", "10043", "jmelius", "j_melius", "élève", "٣٣", "a@b", "1 2", "]"]
+
+    def noise():
+        return "".join(rng.choice(FUZZ_FRAGMENTS) for _ in range(rng.randint(0, 6)))
+
+    for _ in range(count):
+        time_stamp = rng.choice(time_stamps)
+        if rng.random() < 0.1:
+            time_stamp = time_stamp[: rng.randint(0, 18)] + noise()
+        tag = "[AUDIT_TRAIL]" if rng.random() < 0.95 else noise()
+        user = rng.choice(users) if rng.random() < 0.9 else noise()
+        topic = rng.choice(["CREATE_DROPZONE", "", "A] - B", "A]\t-\tB"]) + noise()
+        separator = rng.choice(["] - ", "] - ", "]\t- ", "]- ", "] - "])
+        event = noise() + rng.choice(["", "GET /P000000017/C000000001/ncit.owl HTTP/1.1", "x] - y"]) + noise()
+        yield "[{}]{}[{}][{}{}{}".format(time_stamp, tag, user, topic, separator, event)
+
+
+def test_split_audit_trail_line_matches_regex():
+    fast_results = 0
+    for line in _fuzz_audit_trail_lines(20000):
+        expected = parsers._match_audit_trail_line(line)
+        fast_result = parsers._split_audit_trail_line(line)
+        if fast_result is not None:
+            fast_results += 1
+            assert fast_result == expected, line
+        assert parsers._parse_audit_trail_line(line, False) == expected, line
+    assert fast_results > 0
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "[2022-05-03 16:12:12][AUDIT_TRAIL][10043][CREATE_DROPZONE] - type: direct. User is internal: False",
+        "[2022-05-03 16:12:10][AUDIT_TRAIL][][] - False",
+        "[2022-05-03 16:53:21][AUDIT_TRAIL][jmelius][DOWNLOAD_DATA] - GET /P000000017/C000000001/ncit.owl HTTP/1.1",
+        "[2022-05-03 16:53:21][AUDIT_TRAIL][jmelius][SEARCH] - query: [a] - [b]",
+    ],
+)
+def test_split_audit_trail_line_handles_logger_layout(line):
+    assert parsers._split_audit_trail_line(line) == parsers._match_audit_trail_line(line)
+
+
+@pytest.mark.parametrize(
+    "time_stamp",
+    [
+        "2022-05-03 16:12:12",
+        "2022-05-03 16:12:12",
+        "1999-12-31 23:59:59",
+        "2024-02-29 00:00:00",
+        "2022-05-03\t16:12:12",
+        "2022-02-30 16:12:12",
+        "2022-05-03 24:12:12",
+        "2022-05-03 16:12:60",
+        "0000-05-03 16:12:12",
+        "2022-05-0٣ 16:12:12",
+        "2022-05-+3 16:12:12",
+        "2022/05/03 16:12:12",
+    ],
+)
+def test_decode_time_stamp_matches_strptime(time_stamp):
+    try:
+        expected = datetime.strptime(time_stamp, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        with pytest.raises(ValueError):
+            parsers.decode_time_stamp(time_stamp)
+        return
+    assert parsers.decode_time_stamp(time_stamp) == expected
+    assert parsers.decode_time_stamp(time_stamp, epoch=True) == int(expected.timestamp())
+
+
+def test_parse_audit_trail_message_epoch():
+    log = "[2022-05-03 16:12:12][AUDIT_TRAIL][10043][CREATE_DROPZONE] - type: direct"
+    result = parsers.parse_audit_trail_message(log, parse_time_stamp="epoch")
+    assert result["time_stamp"] == int(datetime(2022, 5, 3, 16, 12, 12).timestamp())
+    result = parsers.parse_audit_trail_message(log, parse_time_stamp=True)
+    assert result["time_stamp"] == datetime(2022, 5, 3, 16, 12, 12)
+
+
+@pytest.mark.parametrize("parse_time_stamp", [False, True, "epoch"])
+@pytest.mark.parametrize(
+    "log",
+    [
+        "[2022-05-03 16:12:12][AUDIT_TRAIL][10043][CREATE_DROPZONE] - type: direct. User is internal: False",
+        "[2022-05-03 16:12:10][AUDIT_TRAIL][][] - False",
+        "[2022-05-03 16:53:21][AUDIT_TRAIL][jmelius][DOWNLOAD_DATA] - GET /P000000017/C000000001/ncit.owl HTTP/1.1",
+        "[2022-05-03 16:53:21][AUDIT_TRAIL][j_melius][SEARCH] - query\n",
+    ],
+)
+def test_parse_audit_trail_message_as_record(log, parse_time_stamp):
+    expected = parsers.parse_audit_trail_message(log, parse_time_stamp)
+    record = parsers.parse_audit_trail_message(log, parse_time_stamp, as_record=True)
+    assert isinstance(record, parsers.AuditRecord)
+    assert record == expected
+    assert dict(record) == expected
+    assert list(record.keys()) == list(expected.keys())
+    assert record.event == expected["event"]
+    assert record["time_stamp"] == expected["time_stamp"]
+    assert pickle.loads(pickle.dumps(record)) == expected
+    with pytest.raises(KeyError):
+        record["unknown"]
+    with pytest.raises(AttributeError):
+        record.extra = 1
+
+
+def test_iter_audit_trail_messages_as_record():
+    records = list(parsers.iter_audit_trail_messages(AUDIT_LOG_LINES * 2, as_record=True))
+    assert records == _expected_audit_logs() * 2
+    assert records[0].topic is records[4].topic
+    assert records[0].irods_user_id is records[4].irods_user_id
+
+
+@pytest.mark.parametrize("opener", [gzip.open, bz2.open, lzma.open])
+def test_iter_audit_trail_messages_compressed(tmp_path, opener):
+    log_path = tmp_path / "audit.log.compressed"
+    with opener(log_path, "wt", encoding="utf-8") as log_file:
+        log_file.write(("".join(AUDIT_LOG_LINES) + "\n") * 50)
+    assert parsers.get_compression_opener(log_path) is opener
+    expected = _expected_audit_logs() * 50
+    assert list(parsers.iter_audit_trail_messages(log_path, chunk_size=256)) == expected
+    assert list(parsers.parse_audit_trail_file_parallel(log_path, max_workers=2)) == expected
+
+
+def test_iter_audit_trail_messages_compressed_early_close(tmp_path):
+    log_path = tmp_path / "audit.log.gz"
+    with gzip.open(log_path, "wt", encoding="utf-8") as log_file:
+        log_file.write(("".join(AUDIT_LOG_LINES) + "\n") * 1000)
+    thread_count = threading.active_count()
+    messages = parsers.iter_audit_trail_messages(log_path, chunk_size=256)
+    assert next(messages) == _expected_audit_logs()[0]
+    messages.close()
+    assert threading.active_count() == thread_count
+
+
+def test_iter_audit_trail_messages_compressed_error(tmp_path):
+    log_path = tmp_path / "audit.log.gz"
+    log_path.write_bytes(gzip.compress("".join(AUDIT_LOG_LINES).encode("utf-8"))[:-10])
+    with pytest.raises(EOFError):
+        list(parsers.iter_audit_trail_messages(log_path))
+
+
+def test_get_compression_opener_plain(tmp_path):
+    log_path = tmp_path / "audit.log"
+    log_path.write_text("".join(AUDIT_LOG_LINES), encoding="utf-8")
+    assert parsers.get_compression_opener(log_path) is None
+
+
+FILTER_LOG_LINES = [
+    "[2022-05-03 16:12:12][AUDIT_TRAIL][10043][CREATE_DROPZONE] - type: direct",
+    "[2022-05-03 16:12:13] [INFO] rods - [DOWNLOAD_DATA] [10043][",
+    "[2022-05-03 16:49:30][AUDIT_TRAIL][10043][DOWNLOAD_DATA] - downloaded",
+    "[2022-05-03 16:49:31][AUDIT_TRAIL][100430][DOWNLOAD_DATA] - downloaded",
+    "[2022-05-03 16:53:21][AUDIT_TRAIL][jmelius][DOWNLOAD_DATA] - GET /P000000017/C000000001/ncit.owl HTTP/1.1",
+    "[2022-05-03 16:53:22][AUDIT_TRAIL][jmelius][LOGIN] - [DOWNLOAD_DATA] in event",
+    "[2022-05-03\t16:55:00][AUDIT_TRAIL][10043][LOGIN] - tab in time stamp",
+    "[2022-05-03 17:00:00][AUDIT_TRAIL][10043][DOWNLOAD_DATA]\t-\ttab separated",
+    "[2022-05-04 09:00:00][AUDIT_TRAIL][][SEARCH] - query",
+]
+
+
+@pytest.mark.parametrize(
+    "criteria",
+    [
+        {},
+        {"topic": AuditTailTopics.DOWNLOAD_DATA},
+        {"topic": "DOWNLOAD_DATA"},
+        {"topic": [AuditTailTopics.LOGIN, "SEARCH"]},
+        {"user_id": 10043},
+        {"user_id": ""},
+        {"user_name": "jmelius"},
+        {"user_name": "jmelius", "topic": AuditTailTopics.LOGIN},
+        {"start": "2022-05-03 16:49:31", "end": datetime(2022, 5, 3, 17)},
+        {"start": datetime(2022, 5, 3, 17), "topic": AuditTailTopics.DOWNLOAD_DATA, "user_id": "10043"},
+    ],
+)
+def test_iter_filtered_audit_trail_messages(criteria):
+    topics = criteria.get("topic")
+    if topics is not None:
+        topics = [topics] if isinstance(topics, (str, AuditTailTopics)) else topics
+        topics = [topic.value if isinstance(topic, AuditTailTopics) else topic for topic in topics]
+    start = criteria.get("start")
+    if isinstance(start, str):
+        start = datetime.strptime(start, "%Y-%m-%d %H:%M:%S")
+    end = criteria.get("end")
+    expected = []
+    for output in parsers.iter_audit_trail_messages(FILTER_LOG_LINES):
+        time_stamp = datetime.strptime(output["time_stamp"].replace("\t", " "), "%Y-%m-%d %H:%M:%S")
+        if (
+            (topics is None or output["topic"] in topics)
+            and ("user_id" not in criteria or output["irods_user_id"] == str(criteria["user_id"]))
+            and ("user_name" not in criteria or output["irods_user_name"] == criteria["user_name"])
+            and (start is None or time_stamp >= start)
+            and (end is None or time_stamp < end)
+        ):
+            expected.append(output)
+    assert list(parsers.iter_filtered_audit_trail_messages(FILTER_LOG_LINES, **criteria)) == expected
+    records = parsers.iter_filtered_audit_trail_messages(FILTER_LOG_LINES, as_record=True, **criteria)
+    assert list(records) == expected
+
+
+@pytest.mark.parametrize("parse_time_stamp", [False, True])
+def test_iter_audit_trail_views(tmp_path, parse_time_stamp):
+    lines = [line.rstrip("\r\n") for line in AUDIT_LOG_LINES + FILTER_LOG_LINES]
+    lines += ["[2022-05-03 16:12:12][AUDIT_TRAIL][élève][LOGIN] - ü", "x" * 30 + "[AUDIT_TRAIL]"]
+    if not parse_time_stamp:
+        lines += [line for line in _fuzz_audit_trail_lines(2000) if "\r" not in line]
+    log_path = tmp_path / "audit.log"
+    log_path.write_bytes("\n".join(lines).encode("utf-8") + b"\r\n" + "\xff".encode("latin-1"))
+    expected = list(parsers.iter_audit_trail_messages(log_path, parse_time_stamp))
+    views = list(parsers.iter_audit_trail_views(log_path, parse_time_stamp))
+    assert [dict(view) for view in views] == expected
+    assert isinstance(views[0], parsers.AuditTrailView)
+    assert views[0].topic == "CREATE_DROPZONE"
+    assert views[0].irods_user_id == "10043"
+    assert views[0].irods_user_name is None
+
+
+def test_iter_audit_trail_views_empty_file(tmp_path):
+    log_path = tmp_path / "audit.log"
+    log_path.write_bytes(b"")
+    assert list(parsers.iter_audit_trail_views(log_path)) == []
+
+
+MERGE_SOURCES = [
+    [
+        "[2022-05-03 16:12:12][AUDIT_TRAIL][10043][LOGIN] - server 1",
+        "[2022-05-03 16:12:14][AUDIT_TRAIL][10043][DOWNLOAD_DATA] - same event",
+        "[2022-05-03 16:12:15] [INFO] rods - not an audit trail message",
+        "[2022-05-03 16:12:16][AUDIT_TRAIL][10043][DOWNLOAD_DATA] - server 1",
+    ],
+    [
+        "[2022-05-03 16:12:11][AUDIT_TRAIL][10044][LOGIN] - server 2",
+        "[2022-05-03 16:12:14][AUDIT_TRAIL][10043][DOWNLOAD_DATA] - same event",
+        "[2022-05-03 16:12:14][AUDIT_TRAIL][10044][DOWNLOAD_DATA] - server 2",
+    ],
+    [],
+    [
+        "[2022-05-03 16:12:12][AUDIT_TRAIL][jmelius][SEARCH] - mdr",
+        "[2022-05-03 16:12:20][AUDIT_TRAIL][jmelius][SEARCH] - mdr",
+    ],
+]
+
+
+@pytest.mark.parametrize("parse_time_stamp", [False, True, "epoch"])
+def test_merge_audit_trail_messages(parse_time_stamp):
+    merged = list(parsers.merge_audit_trail_messages(MERGE_SOURCES, parse_time_stamp))
+    assert [(output["time_stamp"], output["event"]) for output in merged] == sorted(
+        [
+            (output["time_stamp"], output["event"])
+            for source in MERGE_SOURCES
+            for output in parsers.iter_audit_trail_messages(source, parse_time_stamp)
+        ],
+        key=lambda item: item[0],
+    )
+    assert [output["event"] for output in merged] == [
+        "server 2",
+        "server 1",
+        "mdr",
+        "same event",
+        "same event",
+        "server 2",
+        "server 1",
+        "mdr",
+    ]
+
+
+def test_merge_audit_trail_messages_deduplicate():
+    merged = parsers.merge_audit_trail_messages(MERGE_SOURCES, deduplicate=True, as_record=True)
+    assert [(output["irods_user_id"], output["event"]) for output in merged] == [
+        ("10044", "server 2"),
+        ("10043", "server 1"),
+        (None, "mdr"),
+        ("10043", "same event"),
+        ("10044", "server 2"),
+        ("10043", "server 1"),
+        (None, "mdr"),
+    ]
+
+
+MIXED_LOG_LINES = [
+    "[2022-05-03 16:12:12] [ERROR] rods - Something went wrong: [a] - b\n",
+    "[2022-05-03 16:12:12][AUDIT_TRAIL][10043][CREATE_DROPZONE] - type: direct\n",
+    "[2022-05-03 16:12:13] [WARNING] jmelius - careful\n",
+    "[2022-05-03 16:12:14] [INFO] service-account@datahub - started\n",
+    "Traceback (most recent call last):\n",
+    "[2022-05-03 16:12:15] [DEBUG] rods-message without separator\n",
+]
+
+
+@pytest.mark.parametrize(
+    "log, expected",
+    [
+        (
+            "[2022-05-03 16:12:12] [ERROR] rods - Something went wrong: [a] - b",
+            {
+                "time_stamp": "2022-05-03 16:12:12",
+                "severity": "ERROR",
+                "user": "rods",
+                "message": "Something went wrong: [a] - b",
+            },
+        ),
+        (
+            "[2022-05-03 16:12:12] [INFO] service-account@datahub - ",
+            {"time_stamp": "2022-05-03 16:12:12", "severity": "INFO", "user": "service-account@datahub", "message": ""},
+        ),
+        ("[2022-05-03 16:12:12][AUDIT_TRAIL][10043][CREATE_DROPZONE] - type: direct", None),
+        ("[2022-05-03 16:12:12] [DEBUG] rods-message", None),
+        ("wrong", None),
+    ],
+)
+def test_parse_log_message(log, expected):
+    if expected is None:
+        with pytest.raises(ValueError):
+            parsers.parse_log_message(log)
+    else:
+        assert parsers.parse_log_message(log) == expected
+
+
+def test_parse_log_message_format_log_message():
+    log = loggers.format_log_message("warning", "jmelius", "message!@#$%*()_+{}|:<>?")
+    output = parsers.parse_log_message(log, parse_time_stamp=True)
+    assert isinstance(output["time_stamp"], datetime)
+    assert output["severity"] == "WARNING"
+    assert output["user"] == "jmelius"
+    assert output["message"] == "message!@#$%*()_+{}|:<>?"
+
+
+def test_parse_any_log_message():
+    assert "severity" in parsers.parse_any_log_message(MIXED_LOG_LINES[0])
+    assert "topic" in parsers.parse_any_log_message(MIXED_LOG_LINES[1])
+    with pytest.raises(ValueError):
+        parsers.parse_any_log_message(MIXED_LOG_LINES[4])
+
+
+@pytest.mark.parametrize(
+    "severity, expected_users",
+    [
+        (None, ["rods", "jmelius", "service-account@datahub"]),
+        ("error", ["rods"]),
+        (["ERROR", "WARNING"], ["rods", "jmelius"]),
+        ("AUDIT_TRAIL", []),
+    ],
+)
+def test_iter_log_messages(severity, expected_users):
+    assert [output["user"] for output in parsers.iter_log_messages(MIXED_LOG_LINES, severity)] == expected_users
+
+
+@pytest.mark.parametrize(
+    "severity, expected_count",
+    [
+        (None, 4),
+        ("ERROR", 1),
+        (["ERROR", parsers.AUDIT_TRAIL_SEVERITY], 2),
+        (parsers.AUDIT_TRAIL_SEVERITY, 1),
+    ],
+)
+def test_iter_any_log_messages(severity, expected_count):
+    severities = None if severity is None else ([severity] if isinstance(severity, str) else severity)
+    expected = []
+    for line in MIXED_LOG_LINES:
+        try:
+            output = parsers.parse_any_log_message(line.rstrip("\n"))
+        except ValueError:
+            continue
+        if severities is None or output.get("severity", parsers.AUDIT_TRAIL_SEVERITY) in severities:
+            expected.append(output)
+    result = list(parsers.iter_any_log_messages(MIXED_LOG_LINES, severity))
+    assert len(result) == expected_count
+    assert result == expected
+
+
+JSON_CLOCK = loggers.TimeStampClock(lambda: datetime(2022, 5, 3, 16, 12, 12).timestamp())
+JSON_LOG_LINES = [
+    loggers.format_json_log_message("error", "rods", 'Something went wrong: "a" - b\\', JSON_CLOCK) + "\n",
+    loggers.format_json_audit_trail_message(10043, AuditTailTopics.CREATE_DROPZONE, "type: direct", JSON_CLOCK) + "\n",
+    loggers.format_json_log_message("warning", "jmelius", "caréful\n", JSON_CLOCK) + "\n",
+    "Traceback (most recent call last):\n",
+    '{"time_stamp": "2022-05-03 16:12:15", "severity": "AUDIT_TRAIL", "topic": "LOGIN"}\n',
+]
+
+
+@pytest.mark.parametrize(
+    "log, expected",
+    [
+        (
+            JSON_LOG_LINES[0],
+            {
+                "time_stamp": "2022-05-03 16:12:12",
+                "severity": "ERROR",
+                "user": "rods",
+                "message": 'Something went wrong: "a" - b\\',
+            },
+        ),
+        (
+            JSON_LOG_LINES[1],
+            {
+                "time_stamp": "2022-05-03 16:12:12",
+                "irods_user_id": "10043",
+                "irods_user_name": None,
+                "topic": "CREATE_DROPZONE",
+                "event": "type: direct",
+            },
+        ),
+        (
+            JSON_LOG_LINES[2],
+            {"time_stamp": "2022-05-03 16:12:12", "severity": "WARNING", "user": "jmelius", "message": "caréful\n"},
+        ),
+        (JSON_LOG_LINES[3], None),
+        (JSON_LOG_LINES[4], None),
+        ("[1, 2]", None),
+    ],
+)
+def test_parse_json_log_message(log, expected):
+    if expected is None:
+        with pytest.raises(ValueError):
+            parsers.parse_json_log_message(log)
+    else:
+        assert parsers.parse_json_log_message(log) == expected
+
+
+def test_parse_json_log_message_matches_text_format():
+    text = loggers.format_audit_trail_message(10043, "create_dropzone", "type: direct", JSON_CLOCK)
+    assert parsers.parse_json_log_message(JSON_LOG_LINES[1], "epoch") == parsers.parse_audit_trail_message(
+        text, "epoch"
+    )
+
+
+@pytest.mark.parametrize(
+    "severity, expected_count",
+    [
+        (None, 3),
+        ("error", 1),
+        (["ERROR", "WARNING"], 2),
+        (parsers.AUDIT_TRAIL_SEVERITY, 1),
+        ("INFO", 0),
+    ],
+)
+def test_iter_json_log_messages(severity, expected_count):
+    result = list(parsers.iter_json_log_messages(io.StringIO("".join(JSON_LOG_LINES)), severity, True))
+    assert len(result) == expected_count
+    assert all(isinstance(output["time_stamp"], datetime) for output in result)
+
+
+@pytest.mark.parametrize("severity", [None, "error", ["ERROR", "WARNING"], parsers.AUDIT_TRAIL_SEVERITY, "INFO"])
+def test_iter_json_log_messages_other_layout(severity):
+    expected = list(parsers.iter_json_log_messages(JSON_LOG_LINES, severity))
+    # Same messages, written by another producer: compact separators and other key order
+    lines = []
+    for line in JSON_LOG_LINES:
+        try:
+            values = json.loads(line)
+        except ValueError:
+            lines.append(line)
+            continue
+        compact = json.dumps(values, separators=(",", ":"))
+        reordered = json.dumps(dict(reversed(list(values.items()))) if isinstance(values, dict) else values)
+        lines.extend([compact, reordered])
+    result = list(parsers.iter_json_log_messages(lines, severity))
+    assert result == [output for output in expected for _ in range(2)]
@@ -0,0 +1,56 @@
+import re
+
+import pytest
+
+from dhpythonirodsutils import patterns
+
+
+def test_warm_patterns():
+    patterns._COMPILED_PATTERNS.clear()
+    patterns.warm_patterns(["project_id"])
+    assert list(patterns._COMPILED_PATTERNS) == ["project_id"]
+    patterns.warm_patterns()
+    assert set(patterns._COMPILED_PATTERNS) == set(patterns.PATTERN_SOURCES)
+    assert patterns.get_pattern("project_id") is patterns.get_pattern("project_id")
+
+
+def test_get_pattern_unknown():
+    with pytest.raises(KeyError):
+        patterns.get_pattern("unknown")
+
+
+@pytest.mark.parametrize(
+    "budget_number",
+    [
+        "UM-1234567890",
+        "UM-12345678901B",
+        "UM-A/12345678901B.123",
+        "AZM-123456",
+        "XXXXXXXXX",
+        "UM-123456789",
+        "UM-12345678901",
+        "UM-A/12345678901B.12",
+        "AZM-1234567",
+        "XXXXXXXXXX",
+        "UM-1234567890\n",
+        "",
+    ],
+)
+def test_budget_number_alternation(budget_number):
+    expected = any(
+        re.fullmatch(pattern, budget_number)
+        for pattern in (
+            r"^UM-\d{10}$",
+            r"^UM-\d{11}[A-Z]$",
+            r"^UM-[A-Z]/\d{11}[A-Z]\.\d{3}$",
+            r"^AZM-\d{6}$",
+            r"^XXXXXXXXX$",
+        )
+    )
+    assert (patterns.get_pattern("budget_number").fullmatch(budget_number) is not None) == expected
+
+
+def test_benchmark():
+    timings = patterns.benchmark(number=10)
+    assert set(timings) == {"project_id", "budget_number", "project_collection_in_path"}
+    assert all(raw > 0 and registry > 0 for raw, registry in timings.values())
@@ -0,0 +1,99 @@
+import datetime
+
+import pytest
+
+from dhpythonirodsutils import loggers, policies
+from dhpythonirodsutils.enums import AuditTailTopics
+
+TIME_STAMP_CLOCK = loggers.TimeStampClock(lambda: datetime.datetime(2023, 1, 12, 9, 40, 16).timestamp())
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_policy(**kwargs):
+    clock = FakeClock()
+    policy = policies.AuditTrailPolicy(clock=clock, time_stamp_clock=TIME_STAMP_CLOCK, **kwargs)
+    return policy, clock
+
+
+def events(lines):
+    return [line.split("] - ", 1)[1] for line in lines]
+
+
+def test_token_bucket():
+    clock = FakeClock()
+    bucket = policies.TokenBucket(2, 3, clock)
+    assert [bucket.consume() for _ in range(4)] == [True, True, True, False]
+    clock.now = 0.5
+    assert [bucket.consume() for _ in range(2)] == [True, False]
+    clock.now = 100
+    assert [bucket.consume() for _ in range(4)] == [True, True, True, False]
+
+
+@pytest.mark.parametrize("rate, capacity", [(0, 1), (1, 0.5)])
+def test_token_bucket_invalid(rate, capacity):
+    with pytest.raises(ValueError):
+        policies.TokenBucket(rate, capacity)
+
+
+def test_policy_sampling():
+    values = iter([0.1, 0.3, 0.2, 0.9])
+    policy, _ = make_policy(sample_rates={AuditTailTopics.SEARCH: 0.25}, random_source=lambda: next(values))
+    assert [policy.allow("search") for _ in range(4)] == [True, False, True, False]
+    assert policy.dropped == {"SEARCH": 2}
+    # Other topics aren't sampled
+    assert policy.allow(AuditTailTopics.LIST_CO)
+
+
+def test_policy_invalid_sample_rate():
+    with pytest.raises(ValueError):
+        policies.AuditTrailPolicy(sample_rates={"search": 1.5})
+
+
+def test_policy_rate_limit():
+    policy, clock = make_policy(rate_limits={"LIST_CO": (1, 2)})
+    lines = [policy.format_message(10043, AuditTailTopics.LIST_CO, str(number)) for number in range(4)]
+    assert [events(line) for line in lines] == [["0"], ["1"], [], []]
+    clock.now = 1
+    assert events(policy.format_message(10043, "list_co", "4")) == ["4"]
+    assert policy.dropped == {"LIST_CO": 2}
+
+
+@pytest.mark.parametrize("topic", sorted(policies.SECURITY_TOPICS) + ["VIEW_METADATA"])
+def test_policy_protected_topics_never_dropped(topic):
+    policy, _ = make_policy(
+        sample_rates={topic: 0, "SEARCH": 0},
+        rate_limits={topic: (1, 1)},
+        dedup_window=60,
+        protected_topics=[AuditTailTopics.VIEW_METADATA],
+    )
+    for _ in range(5):
+        assert events(policy.format_message(10043, topic, "event")) == ["event"]
+    assert policy.format_message(10043, "search", "event") == []
+    assert policy.flush() == []
+
+
+def test_policy_deduplication():
+    policy, clock = make_policy(dedup_window=10)
+    assert events(policy.format_message(10043, "view_metadata", "page 1")) == ["page 1"]
+    assert policy.format_message(10043, AuditTailTopics.VIEW_METADATA, "page 1") == []
+    assert policy.format_message(10043, "VIEW_METADATA", "page 1") == []
+    # Different user or event: not collapsed
+    assert events(policy.format_message(10044, "view_metadata", "page 1")) == ["page 1"]
+    clock.now = 5
+    assert events(policy.format_message(10043, "view_metadata", "page 2")) == ["page 2"]
+    assert policy.format_message(10043, "view_metadata", "page 2") == []
+    clock.now = 10
+    lines = policy.format_message(10043, "view_metadata", "page 1")
+    assert lines == [
+        "[2023-01-12 09:40:16][AUDIT_TRAIL][10043][VIEW_METADATA] - page 1 [repeated 2 times]",
+        "[2023-01-12 09:40:16][AUDIT_TRAIL][10043][VIEW_METADATA] - page 1",
+    ]
+    assert events(policy.flush()) == ["page 2 [repeated 1 times]"]
+    assert policy.flush() == []
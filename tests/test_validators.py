@@ -1,3 +1,7 @@
+import os
+import posixpath
+import random
+
 import pytest
 
 from dhpythonirodsutils import validators
@@ -413,3 +417,195 @@ def test_validate_project_collections_action_avu_valid(attribute):
 def test_validate_project_collections_action_avu_invalid(attribute):
     with pytest.raises(ValidationError):
         validators.validate_project_collections_action_avu(attribute)
+
+
+BULK_VALUES = [
+    "P000000001",
+    "P000000001\n",
+    "C000000001",
+    "/nlmumc/projects/P000000001",
+    "/nlmumc/projects/P000000001/C000000001",
+    "/nlmumc/projects/P000000001/C000000001/schema.json",
+    "/nlmumc/projects/P00000001/C000000001",
+    "crazy-frog",
+    "crazy frog",
+    "UM-1234567890",
+    "UM-12345678901B",
+    "UM-A/12345678901B.123",
+    "AZM-123456",
+    "XXXXXXXXX",
+    "UM-1234567890\n",
+    "",
+    None,
+    10,
+]
+
+
+@pytest.mark.parametrize(
+    "bulk_validator, validator",
+    [
+        (validators.validate_project_ids, validators.validate_project_id),
+        (validators.validate_project_paths, validators.validate_project_path),
+        (validators.validate_collection_ids, validators.validate_collection_id),
+        (validators.validate_project_collection_paths, validators.validate_project_collection_path),
+        (validators.validate_file_paths, validators.validate_file_path),
+        (validators.validate_irods_collections, validators.validate_irods_collection),
+        (validators.validate_dropzone_tokens, validators.validate_dropzone_token),
+        (validators.validate_budget_numbers, validators.validate_budget_number),
+    ],
+)
+def test_bulk_validators_match_single_validators(bulk_validator, validator):
+    expected_mask = []
+    expected_failures = []
+    for index, value in enumerate(BULK_VALUES):
+        try:
+            expected_mask.append(validator(value))
+        except ValidationError as error:
+            expected_mask.append(False)
+            expected_failures.append((index, error.message))
+        except TypeError:
+            expected_mask.append(False)
+    mask, failures = bulk_validator(iter(BULK_VALUES))
+    assert mask == expected_mask
+    assert [index for index, _ in failures] == [index for index, valid in enumerate(expected_mask) if not valid]
+    assert set(expected_failures) <= set(failures)
+
+
+def test_bulk_validators_numpy():
+    np = pytest.importorskip("numpy")
+    values = np.array(["P000000001", "P00000001", "C000000001", "P999999999"])
+    mask, failures = validators.validate_project_ids(values)
+    assert isinstance(mask, np.ndarray)
+    assert mask.tolist() == [True, False, False, True]
+    assert failures == [(1, "Invalid project id P00000001"), (2, "Invalid project id C000000001")]
+    assert values[mask].tolist() == ["P000000001", "P999999999"]
+
+
+def test_bulk_validators_empty():
+    assert validators.validate_collection_ids([]) == ([], [])
+
+
+PREDICATE_VALUES = BULK_VALUES + [
+    "mounted",
+    "direct",
+    "true",
+    "False",
+    "1",
+    "-1",
+    5,
+    "ARCHIVE",
+    "BROWSE",
+    "enableArchive",
+    "enableUnarchive",
+]
+
+
+@pytest.mark.parametrize("name", sorted(validators.VALIDATION_SPECS))
+def test_is_valid_matches_validate(name):
+    predicate = getattr(validators, "is_valid_" + name)
+    validator = getattr(validators, "validate_" + name)
+    assert predicate.__name__ == "is_valid_" + name
+    for value in PREDICATE_VALUES:
+        try:
+            expected = validator(value)
+        except ValidationError:
+            expected = False
+        assert predicate(value) is expected, value
+
+
+@pytest.mark.parametrize("value", ["/nlmumc/projects/P000000001", "/nlmumc/projects/P000000001/C000000001"])
+def test_is_valid_irods_collection(value):
+    assert validators.is_valid_irods_collection(value)
+    assert not validators.is_valid_irods_collection(value + "/file.txt")
+
+
+@pytest.mark.parametrize(
+    "validator, value",
+    [
+        (validators.validate_project_id, "P000000001\n"),
+        (validators.validate_collection_id, "C000000001\n"),
+        (validators.validate_project_path, "/nlmumc/projects/P000000001\n"),
+        (validators.validate_dropzone_token, "crazy-frog\n"),
+    ],
+)
+def test_validate_trailing_newline_invalid(validator, value):
+    with pytest.raises(ValidationError):
+        validator(value)
+
+
+FUZZ_COMPONENTS = ["", ".", "..", "...", "nlmumc", "projects", "P000000001", "C000000001", "C000000002", ".a", "a."]
+FUZZ_BASEDIRS = [
+    "/nlmumc/projects/P000000001/C000000001",
+    "/nlmumc/projects/P000000001",
+    "/nlmumc/projects/P000000001/",
+    "//nlmumc/projects",
+    "/",
+    "",
+]
+
+
+def _fuzz_paths(count, seed=20240501):
+    generator = random.Random(seed)
+    for _ in range(count):
+        components = [generator.choice(FUZZ_COMPONENTS) for _ in range(generator.randint(0, 9))]
+        prefix = generator.choice(["", "/", "/", "/", "//", "///", "/nlmumc/projects/P000000001/C000000001/"])
+        yield prefix + "/".join(components)
+
+
+def _reference_path_safety(basedir, path):
+    return basedir == validators.commonpath([basedir, os.path.abspath(path)])
+
+
+def test_normalize_irods_path_matches_normpath():
+    for path in _fuzz_paths(5000):
+        assert validators.normalize_irods_path(path) == posixpath.normpath(path), path
+
+
+@pytest.mark.parametrize("basedir", FUZZ_BASEDIRS)
+def test_is_safe_path_matches_abspath_commonpath(basedir, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    paths = list(_fuzz_paths(3000))
+    for path in paths:
+        expected = path.startswith("/") and _reference_path_safety(basedir, path)
+        assert validators.is_safe_path(basedir, path) is expected, path
+    mask, failures = validators.validate_paths_safety(basedir, paths + [None])
+    assert mask == [validators.is_safe_path(basedir, path) for path in paths] + [False]
+    assert [index for index, _ in failures] == [index for index, safe in enumerate(mask) if not safe]
+
+
+def test_validate_path_safety_relative():
+    with pytest.raises(ValidationError):
+        validators.validate_path_safety("/nlmumc/projects/P000000001/C000000001", "nlmumc/projects/P000000001")
+
+
+@pytest.mark.parametrize("basedir", [basedir for basedir in FUZZ_BASEDIRS if basedir])
+def test_path_containment_checker_matches_is_safe_path(basedir):
+    checker = validators.PathContainmentChecker(basedir)
+    for path in _fuzz_paths(3000):
+        if path.startswith("/"):
+            assert checker.check(path) is validators.is_safe_path(basedir, path), path
+        relative_path = path.lstrip("/")
+        expected = validators.is_safe_path(basedir, posixpath.join(basedir, relative_path))
+        assert checker.check(relative_path) is expected, relative_path
+        joined_path = posixpath.normpath(posixpath.join(basedir, relative_path))
+        assert checker.resolve(relative_path) == (joined_path, expected), relative_path
+
+
+def test_path_containment_checker_caches_prefixes():
+    basedir = "/nlmumc/projects/P000000001/C000000001"
+    checker = validators.PathContainmentChecker(basedir)
+    paths = ["dir{}/sub/file{}.txt".format(number % 3, number) for number in range(100)]
+    mask, failures = checker.check_many(paths + ["dir0/../../C000000002/file.txt", "../C000000001/ok.txt", None])
+    assert mask == [True] * 100 + [False, True, False]
+    assert failures == [(100, "Path is not safe: dir0/../../C000000002/file.txt"), (102, "Path is not safe: None")]
+    # Base directory, dir0..dir2 and their sub directories, then the prefixes of the two dot-dot paths: only the new
+    # components are resolved
+    assert len(checker._relative_directories) == 1 + 6 + 3 + 2
+    assert checker.validate(basedir + "/dir0/sub/file0.txt")
+    with pytest.raises(ValidationError):
+        checker.validate("/nlmumc/projects/P000000001/C000000002/file.txt")
+
+
+def test_path_containment_checker_relative_basedir():
+    with pytest.raises(ValidationError):
+        validators.PathContainmentChecker("nlmumc/projects")